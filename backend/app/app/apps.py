@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class SigningAppConfig(AppConfig):
+    name = "app"
+
+    def ready(self):
+        # Drain signing jobs queued (or left running) before this process started
+        if settings.SIGNING_JOB_AUTOSTART:
+            from .jobs import worker_pool
+
+            worker_pool.start()
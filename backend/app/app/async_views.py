@@ -0,0 +1,136 @@
+"""
+Async versions of the I/O-bound views, routed instead of the ones in views.py
+when ASYNC_VIEWS is on (see urls.py): QR-scan verification, download and
+listing.
+
+Queries use the async ORM and files are read on the thread pool, while
+hashing and signature checks run on worker threads. Under ASGI a slow client
+or a large download then holds a coroutine rather than a thread.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_http_methods
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import views
+from .downloads import serve_document
+from .instrumentation import span
+from .models import Document
+from .pagination import KeysetPagination, filter_documents
+from .verification import stored_copy_etag, verify_stored_copy
+from .verification_cache import verification_cache
+
+
+def jwt_required(view):
+    """
+    The async counterpart of @permission_classes([IsAuthenticated]) with JWT
+    authentication, answering like DRF does.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authentication = JWTAuthentication()
+        try:
+            # The token is checked in memory; only loading its user queries the database
+            result = await sync_to_async(authentication.authenticate)(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            result, error = None, detail
+        else:
+            error = {"detail": "Authentication credentials were not provided."}
+        if result is None:
+            response = JsonResponse(error, status=401)
+            response["WWW-Authenticate"] = authentication.authenticate_header(request)
+            return response
+
+        request.user, request.auth = result
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404 as e:
+            return JsonResponse({"detail": str(e)}, status=404)
+    return wrapper
+
+
+# Document verification view
+async def verify_document(request):
+    # Verifying an upload hashes and may OCR it; the synchronous view handles it on a thread
+    if request.method != "GET":
+        return await sync_to_async(views.verify_document)(request)
+
+    try:
+        document_id = request.GET.get("id")
+
+        # Retrieve document for verification
+        with span("document_lookup"):
+            document = await aget_object_or_404(Document.objects.metadata(), document_id=document_id)
+
+        # Repeat scans of an unchanged document are answered from the ETag alone
+        fingerprint = await sync_to_async(verification_cache.fingerprint, thread_sensitive=False)(
+            document, document.pdf_file.path
+        )
+        etag = stored_copy_etag(fingerprint)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            # Hashing the stored copy and checking its signature run on a worker thread
+            is_verified = await sync_to_async(verify_stored_copy, thread_sensitive=False)(document, fingerprint)
+            verification_status = "Authentic and Untampered" if is_verified else "Document Verification Failed"
+
+            response = render(
+                request,
+                "verify_document.html",
+                {"document_id": document.document_id, "status": verification_status},
+            )
+
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=settings.VERIFICATION_CACHE_MAX_AGE)
+        return response
+
+    except Document.DoesNotExist:
+        return render(request, "verify_document.html", {"error": "Document not found."})
+    except Exception:
+        return render(request, "verify_document.html", {"error": "Document Verification Failed"})
+
+
+# Document download view
+@require_http_methods(["GET"])
+@jwt_required
+async def download_document(request, document_id):
+    document = await aget_object_or_404(Document.objects.metadata(), id=document_id)
+
+    # The signed copy is streamed from an async iterator
+    return serve_document(request, document, f"{document.document_name}.pdf", asynchronous=True)
+
+
+# Document listing view
+@require_http_methods(["GET"])
+async def list_documents(request):
+    # Numbered pages (?page=) count rows through DRF's paginator; the synchronous view serves them
+    if "page" in request.GET:
+        return await sync_to_async(views.list_documents)(request)
+    return await _list_documents_by_cursor(request)
+
+
+@jwt_required
+async def _list_documents_by_cursor(request):
+    # The filters and paginator read query_params and user from a DRF request
+    user = request.user
+    request = Request(request)
+    request.user = user
+
+    # Only the listed columns are selected, never the text or signature blobs
+    paginator = KeysetPagination()
+    try:
+        documents = filter_documents(Document.objects.values("id", "document_name", "created_at"), request)
+        result_page = await paginator.apaginate_queryset(documents, request)
+    except ValueError as ve:
+        return JsonResponse({"error": str(ve)}, status=400)
+
+    return JsonResponse({"next": paginator.get_next_link(), "results": views.document_list(result_page, request)})
@@ -0,0 +1,214 @@
+import functools
+import json
+import multiprocessing
+import os
+import tarfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from cryptography.hazmat.primitives import serialization
+
+from .blob_store import blob_store
+from .digital_signature import key_algorithm
+from .key_pool import get_signing_key, public_key_pem
+from .merkle import document_root, pack_digests
+from .models import Document
+from .qr_code import verification_url
+from .signature_batches import sign_documents
+from .signing import reserve_signed_copy, store_upload
+from .signing_worker import sign_in_worker
+from .text_extraction import cached_pdf_text, extract_pdf_text, text_cache
+from .text_similarity import text_fingerprint
+
+# Archive members are copied into the blob store in 1 MB chunks
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Process pool shared by batch requests, created on first use.
+
+    Workers are spawned rather than forked so they never inherit locks held
+    by the key pool or signing worker threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.BATCH_SIGNING_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _read_chunks(member_file):
+    return iter(lambda: member_file.read(ARCHIVE_CHUNK_SIZE), b"")
+
+
+def _archive_members(archive):
+    # Yield (file name, chunk iterator) for every PDF inside a zip or tar archive
+    if archive.name.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as zip_file:
+            for member in zip_file.infolist():
+                if not member.is_dir() and member.filename.lower().endswith(".pdf"):
+                    with zip_file.open(member) as member_file:
+                        yield os.path.basename(member.filename), _read_chunks(member_file)
+    else:
+        with tarfile.open(fileobj=archive, mode="r:*") as tar_file:
+            for member in tar_file:
+                if member.isfile() and member.name.lower().endswith(".pdf"):
+                    yield os.path.basename(member.name), _read_chunks(tar_file.extractfile(member))
+
+
+def collect_batch_items(request):
+    """
+    Store every uploaded PDF in the blob store and return [(file name, content hash)].
+
+    Accepts several `documents` files and/or one `archive` (.zip, .tar, .tar.gz).
+    """
+    items = []
+    for uploaded_file in request.FILES.getlist("documents"):
+        if not uploaded_file.name.lower().endswith(".pdf"):
+            raise ValueError(f"Unsupported file type: {uploaded_file.name}")
+        if uploaded_file.size == 0:
+            raise ValueError(f"Uploaded file is empty: {uploaded_file.name}")
+        items.append((uploaded_file.name, store_upload(uploaded_file)))
+
+    archive = request.FILES.get("archive")
+    if archive:
+        try:
+            for file_name, chunks in _archive_members(archive):
+                items.append((file_name, blob_store.put_stream(chunks)))
+                if len(items) > settings.BATCH_SIGNING_MAX_FILES:
+                    break
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise ValueError(f"Unreadable archive: {str(e)}")
+
+    if not items:
+        raise ValueError("No PDF documents uploaded.")
+    if len(items) > settings.BATCH_SIGNING_MAX_FILES:
+        raise ValueError(f"Too many documents. At most {settings.BATCH_SIGNING_MAX_FILES} can be signed per batch.")
+    return items
+
+
+def sign_batch(items, tenant=None, owner_id=None):
+    """
+    Sign many stored originals across the process pool.
+
+    Yields one NDJSON line per document as it completes. Documents finishing
+    together are written with a single bulk insert before their lines are
+    yielded, so every reported document_id already exists.
+
+    With SIGNATURE_BATCHING the workers only stamp and hash, and the documents
+    finishing within SIGNATURE_BATCH_WINDOW of each other share one signature.
+    """
+    executor = get_executor()
+    batched = settings.SIGNATURE_BATCHING
+    pending = {}
+
+    # One key signs the whole batch: taking one per document would drain the key
+    # pool and generate the rest one by one in this thread, outside the process pool
+    private_key_der, public_key, key_id, algorithm = None, b"", None, settings.SIGNATURE_ALGORITHM
+    if not batched:
+        private_key, key_id = get_signing_key(tenant=tenant)
+        public_key = public_key_pem(private_key)
+        algorithm = key_algorithm(private_key)
+        private_key_der = private_key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+
+    for file_name, document_hash in items:
+        document_id = str(uuid.uuid4())
+        pdf_name, document_path = reserve_signed_copy(file_name)
+
+        # Text already known for this content is not extracted again
+        text = cached_pdf_text(document_hash)
+        future = executor.submit(
+            sign_in_worker, blob_store.path(document_hash), document_path,
+            verification_url(document_id), private_key_der, text is None,
+        )
+        pending[future] = {
+            "file_name": file_name,
+            "document": Document(
+                document_id=document_id,
+                document_name=os.path.splitext(file_name)[0],
+                hash=document_hash,
+                public_key=public_key,
+                key_id=key_id,
+                signature_algorithm=algorithm,
+                pdf_file=pdf_name,
+                owner_id=owner_id,
+                text_content=text,
+                text_fingerprint=text_fingerprint(text) if text is not None else None,
+            ),
+        }
+
+    signed = 0
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if batched:
+                # Let documents finishing shortly after share the signature
+                done, _ = wait(pending, timeout=settings.SIGNATURE_BATCH_WINDOW)
+
+            documents, lines = [], []
+            for future in done:
+                item = pending.pop(future)
+                document = item["document"]
+                try:
+                    result = future.result()
+                    if result["needs_ocr"]:
+                        result["text"] = extract_pdf_text(document.hash)
+                except Exception as e:
+                    document.pdf_file.storage.delete(document.pdf_file.name)
+                    lines.append({"file_name": item["file_name"], "error": f"Error processing the PDF: {str(e)}"})
+                    continue
+
+                document.signature = result["signature"]
+                document.signed_hash = result["signed_digest"].hex()
+                document.page_hashes = pack_digests(result["page_digests"])
+                document.merkle_root = document_root(result["signed_digest"], result["page_digests"]).hex()
+                if result["text"] is not None:
+                    document.text_content = result["text"]
+                    document.text_fingerprint = text_fingerprint(result["text"])
+                    text_cache.set(document.hash, result["text"])
+                documents.append(document)
+                lines.append({"file_name": item["file_name"], "document_id": document.document_id})
+
+            try:
+                if batched and documents:
+                    # One private-key operation for everything in this round
+                    sign_documents(documents, tenant=tenant)
+                Document.objects.bulk_create(documents, batch_size=settings.BATCH_INSERT_SIZE)
+            except Exception:
+                # Signed copies of documents that were never saved are not kept
+                for document in documents:
+                    document.pdf_file.storage.delete(document.pdf_file.name)
+                raise
+            signed += len(documents)
+            for line in lines:
+                yield json.dumps(line) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": f"Batch signing failed: {str(e)}"}) + "\n"
+        return
+    finally:
+        # The client disconnected or the batch failed: skip the documents not
+        # started yet and drop the signed copies reserved for all of them
+        for future, item in pending.items():
+            future.cancel()
+            future.add_done_callback(functools.partial(_delete_signed_copy, item["document"].pdf_file))
+
+    yield json.dumps({"signed": signed, "failed": len(items) - signed}) + "\n"
+
+
+def _delete_signed_copy(pdf_file, future):
+    # Runs once the future is cancelled or, if it was already running, has finished writing
+    pdf_file.storage.delete(pdf_file.name)
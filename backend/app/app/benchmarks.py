@@ -0,0 +1,382 @@
+"""
+Benchmark suite for the signing and verification pipeline.
+
+Inputs are generated deterministically (reportlab PDFs and PIL images with
+text from a fixed seed), every timing uses time.perf_counter, and results
+are plain JSON so a run can be compared with a stored baseline. See
+`manage.py run_benchmarks`.
+"""
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.pdfgen import canvas
+
+# Fixed seed: every run benchmarks byte-identical inputs
+SEED = 1234
+
+WORDS = (
+    "agreement party signature clause payment term notice property lease contract "
+    "witness schedule liability date amount tenant landlord deposit annex section"
+).split()
+
+# Corpus sizes: PDFs by page count, scans by pixel size (letter paper at 100, 200 and 300 DPI)
+PDF_PAGES = {"pdf-1p": 1, "pdf-10p": 10, "pdf-100p": 100}
+IMAGE_SIZES = {"scan-100dpi": (850, 1100), "scan-200dpi": (1700, 2200), "scan-300dpi": (2550, 3300)}
+QUICK_PDF_PAGES = {"pdf-1p": 1, "pdf-10p": 10}
+QUICK_IMAGE_SIZES = {"scan-100dpi": (850, 1100)}
+
+# Default share by which a median may grow (or a throughput shrink) before it counts as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def _lines(rng, count, words_per_line=12):
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(count)]
+
+
+def generate_pdf(pages, seed=SEED, label=""):
+    """
+    A text PDF with `pages` pages of 40 lines each.
+    """
+    rng = random.Random(seed)
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    for page in range(pages):
+        c.drawString(72, 800, f"{label} page {page + 1}")
+        for number, line in enumerate(_lines(rng, 40)):
+            c.drawString(72, 780 - number * 18, line)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def generate_image(size, seed=SEED):
+    """
+    A PNG "scan": dark text lines on a light, slightly noisy page.
+    """
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.effect_noise(size, 12).point(lambda value: 200 + value // 5).convert("L")
+    draw = ImageDraw.Draw(image)
+    # Roughly 12 pt text at the scan's resolution
+    line_height = max(12, height // 60)
+    font = ImageFont.load_default(size=line_height * 2 // 3)
+    for number, line in enumerate(_lines(rng, 50, words_per_line=8)):
+        draw.text((width // 10, line_height * (number + 3)), line, fill=20, font=font)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", dpi=(round(width / 8.5),) * 2)
+    return buffer.getvalue()
+
+
+def build_corpus(quick=False):
+    """
+    Return {"pdf": {name: bytes}, "image": {name: bytes}}.
+    """
+    return {
+        "pdf": {name: generate_pdf(pages) for name, pages in (QUICK_PDF_PAGES if quick else PDF_PAGES).items()},
+        "image": {name: generate_image(size) for name, size in (QUICK_IMAGE_SIZES if quick else IMAGE_SIZES).items()},
+    }
+
+
+def summarize(durations):
+    """
+    Milliseconds statistics of a list of durations in seconds.
+    """
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """
+    Time `repeat` calls of func() after `warmup` untimed calls.
+    """
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def tesseract_available():
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run_microbenchmarks(corpus, repeat=5):
+    """
+    Time the individual pipeline functions on every corpus entry.
+    """
+    from .digital_signature import sign_document, verify_signature
+    from .key_pool import generate_rsa_key
+    from .qr_code import embed_qr_code_and_link, verification_url
+    from .utils import extract_text_from_image, extract_text_from_pdf
+
+    results = {}
+    private_key = generate_rsa_key()
+    public_key = private_key.public_key()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, content in corpus["pdf"].items():
+            signature = sign_document(content, private_key)
+            results[f"micro.sign_document.{name}"] = measure(lambda: sign_document(content, private_key), repeat)
+            results[f"micro.verify_signature.{name}"] = measure(lambda: verify_signature(content, signature, public_key), repeat)
+            results[f"micro.extract_text_from_pdf.{name}"] = measure(lambda: extract_text_from_pdf(BytesIO(content)), repeat)
+
+            pdf_path = os.path.join(work_dir, f"{name}.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(content)
+            output_path = os.path.join(work_dir, f"{name}-stamped.pdf")
+            url = verification_url("00000000-0000-0000-0000-000000000000")
+            results[f"micro.embed_qr_code_and_link.{name}"] = measure(lambda: embed_qr_code_and_link(pdf_path, url, output_path), repeat)
+
+    if tesseract_available():
+        for name, content in corpus["image"].items():
+            results[f"micro.extract_text_from_image.{name}"] = measure(lambda: extract_text_from_image(BytesIO(content)), repeat)
+    else:
+        for name in corpus["image"]:
+            results[f"micro.extract_text_from_image.{name}"] = {"skipped": "Tesseract is not installed"}
+    return results
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    A throwaway database, media and blob directory for end-to-end runs.
+
+    SQLite test databases are put in a file rather than in memory, so client
+    threads wait on each other's write locks instead of failing.
+    """
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        overrides = override_settings(
+            MEDIA_ROOT=work_dir,
+            BLOB_STORE_ROOT=os.path.join(work_dir, "blobs"),
+            SIGNING_KEY_DIR=os.path.join(work_dir, "keys"),
+            EXTRACTION_CACHE={"ENABLED": False, "LOCATION": os.path.join(work_dir, "extraction_cache"), "MAX_BYTES": 0},
+            VERIFICATION_CACHE={"BACKEND": "locmem", "MAX_ENTRIES": 10000},
+        )
+        overrides.enable()
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        test_name = test_settings.get("NAME")
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(work_dir, "benchmark.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = test_name
+            teardown_test_environment()
+            overrides.disable()
+
+
+def _authenticated_client():
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    user, _ = User.objects.get_or_create(username="benchmark")
+    return Client(headers={"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"})
+
+
+def run_concurrently(request, count, concurrency):
+    """
+    Send `count` requests from `concurrency` threads, each with its own client.
+
+    request(client, index) returns True on success. Returns latency
+    statistics, the error count and the overall throughput.
+    """
+    from django.db import connections
+
+    indexes = iter(range(count))
+    lock = threading.Lock()
+    durations, errors = [], []
+    clients = [_authenticated_client() for _ in range(concurrency)]
+
+    def worker(client):
+        try:
+            while True:
+                with lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    error = None if request(client, index) else f"request {index} failed"
+                except Exception as e:
+                    error = f"request {index}: {e}"
+                elapsed = time.perf_counter() - start
+                with lock:
+                    durations.append(elapsed)
+                    if error:
+                        errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    result = summarize(durations) if durations else {"runs": 0}
+    result.update({"concurrency": concurrency, "errors": len(errors), "throughput_rps": round(len(durations) / wall, 3)})
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def run_end_to_end(corpus, concurrency_levels=(1, 4), requests=20):
+    """
+    Throughput of signing, verification (digest, full signature and OCR) and
+    listing through the Django test client, at each concurrency level.
+    """
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.urls import reverse
+
+    from .models import Document
+
+    results = {}
+    # Requests upload the smallest PDF of the corpus
+    pdf_name = next(iter(corpus["pdf"]))
+    pages = PDF_PAGES[pdf_name]
+    with benchmark_environment():
+        for concurrency in concurrency_levels:
+            # Distinct content per request, so no upload hits a text cache
+            uploads = [generate_pdf(pages, seed=SEED + concurrency * 100000 + i) for i in range(requests)]
+            document_ids = [None] * requests
+
+            def sign(client, index):
+                upload = SimpleUploadedFile(f"bench-{index}.pdf", uploads[index], content_type="application/pdf")
+                response = client.post(reverse("create_signed_document"), {"document": upload})
+                if response.status_code != 200:
+                    return False
+                document_ids[index] = response.json()["document_id"]
+                return True
+
+            results[f"e2e.sign.{pdf_name}.c{concurrency}"] = run_concurrently(sign, requests, concurrency)
+
+            signed_copies = {}
+            for document in Document.objects.filter(document_id__in=[i for i in document_ids if i]):
+                with document.pdf_file.open("rb") as f:
+                    signed_copies[document.document_id] = f.read()
+            signed_ids = list(signed_copies)
+            if not signed_ids:
+                continue
+
+            def verify(full):
+                def request(client, index):
+                    document_id = signed_ids[index % len(signed_ids)]
+                    upload = SimpleUploadedFile("signed.pdf", signed_copies[document_id], content_type="application/pdf")
+                    data = {"id": document_id, "document": upload, "full": "true" if full else "false"}
+                    response = client.post(reverse("verify_document"), data)
+                    return response.status_code == 200 and response.json().get("verified") is True
+                return request
+
+            results[f"e2e.verify.{pdf_name}.c{concurrency}"] = run_concurrently(verify(False), requests, concurrency)
+            results[f"e2e.verify_full.{pdf_name}.c{concurrency}"] = run_concurrently(verify(True), requests, concurrency)
+
+            def list_documents(client, index):
+                return client.get(reverse("list_documents"), {"page_size": 20}).status_code == 200
+
+            results[f"e2e.list.c{concurrency}"] = run_concurrently(list_documents, requests, concurrency)
+
+            if tesseract_available():
+                image_name, image = next(iter(corpus["image"].items()))
+
+                def verify_ocr(client, index):
+                    scan = SimpleUploadedFile(f"scan-{index}.png", image, content_type="image/png")
+                    response = client.post(reverse("verify_document"), {
+                        "id": signed_ids[index % len(signed_ids)], "document": scan, "use_ocr": "true", "no_cache": "true",
+                    })
+                    return response.status_code == 200
+
+                results[f"e2e.verify_ocr.{image_name}.c{concurrency}"] = run_concurrently(verify_ocr, requests, concurrency)
+    return results
+
+
+def run_suite(quick=False, repeat=5, concurrency_levels=(1, 4), requests=20, micro=True, end_to_end=True):
+    """
+    Run the selected benchmarks and return the JSON-serialisable report.
+    """
+    corpus = build_corpus(quick)
+    results = {}
+    if micro:
+        results.update(run_microbenchmarks(corpus, repeat))
+    if end_to_end:
+        results.update(run_end_to_end(corpus, concurrency_levels, requests))
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+            "repeat": repeat,
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two reports benchmark by benchmark.
+
+    Returns [{"name", "metric", "baseline", "current", "change", "regression"}]
+    for every benchmark present in both. Medians regress when they grow by
+    more than `threshold`, throughputs when they shrink by more than it.
+    """
+    comparisons = []
+    for name, current_result in sorted(current["results"].items()):
+        baseline_result = baseline["results"].get(name)
+        if not baseline_result:
+            continue
+        if "throughput_rps" in current_result and "throughput_rps" in baseline_result:
+            metric, higher_is_better = "throughput_rps", True
+        elif "median_ms" in current_result and "median_ms" in baseline_result:
+            metric, higher_is_better = "median_ms", False
+        else:
+            continue
+
+        before, after = baseline_result[metric], current_result[metric]
+        change = (after - before) / before if before else 0.0
+        regression = change < -threshold if higher_is_better else change > threshold
+        comparisons.append({
+            "name": name, "metric": metric, "baseline": before, "current": after,
+            "change": round(change, 4), "regression": regression,
+        })
+    return comparisons
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+
+
+class BlobStore:
+    """
+    Content-addressed storage for original document bytes.
+
+    Blobs are keyed by their SHA-256 hex digest and sharded into two levels
+    of directories (ab/cd/abcd...) so no single directory grows unbounded.
+    Identical content is only ever stored once.
+    """
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @property
+    def root(self):
+        # Without an explicit root, follow settings.BLOB_STORE_ROOT
+        return str(self._root or settings.BLOB_STORE_ROOT)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def _prepare(self, digest):
+        blob_path = self.path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        return blob_path
+
+    def put_upload(self, uploaded_file, digest):
+        """
+        Store an uploaded file under its digest.
+
+        Spooled uploads are moved into place instead of copied. Returns False
+        when the blob already existed and nothing had to be written.
+        """
+        if self.exists(digest):
+            return False
+
+        blob_path = self._prepare(digest)
+        if hasattr(uploaded_file, "temporary_file_path"):
+            try:
+                file_move_safe(uploaded_file.temporary_file_path(), blob_path)
+            except FileExistsError:
+                # An identical upload was stored concurrently
+                return False
+        else:
+            self._write_atomic(blob_path, uploaded_file.chunks())
+        return True
+
+    def put_bytes(self, content, digest):
+        if self.exists(digest):
+            return False
+
+        self._write_atomic(self._prepare(digest), [content])
+        return True
+
+    def put_stream(self, chunks):
+        """
+        Store content of unknown digest (e.g. an archive member), hashing it
+        while it is written. Returns the hex digest.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+
+            digest = hasher.hexdigest()
+            if self.exists(digest):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, self._prepare(digest))
+            return digest
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_atomic(self, blob_path, chunks):
+        # Write to a temporary file in the shard directory, then rename into place
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                for chunk in chunks:
+                    tmp_file.write(chunk)
+            os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, digest):
+        return open(self.path(digest), "rb")
+
+    def read(self, digest):
+        with self.open(digest) as blob:
+            return blob.read()
+
+
+blob_store = BlobStore()
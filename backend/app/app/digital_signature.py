@@ -1,49 +1,179 @@
+import hashlib
+import logging
+from functools import lru_cache
+from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding
 from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives import hashes
+
+from .instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+# Read files in 1 MB chunks when hashing
+HASH_CHUNK_SIZE = 1024 * 1024
+
+PSS_PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+# Algorithm identifiers stored with every signature
+RSA_PSS = "rsa-pss-sha256"
+ECDSA_P256 = "ecdsa-p256-sha256"
+ED25519 = "ed25519"
+
+
+@lru_cache(maxsize=1024)
+def load_public_key(public_key_pem):
+    """
+    Parse a PEM public key once; documents signed with a shared or tenant key reuse the parsed object.
+    """
+    return serialization.load_pem_public_key(bytes(public_key_pem))
+
+
+@timed("hash_file")
+def hash_file(path):
+    """
+    Compute the SHA-256 digest of a file on disk without loading it into memory.
+    """
+    document_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            document_hash.update(chunk)
+    return document_hash.digest()
+
+
+def _signed_message_hash(digest):
+    # Signatures have always been computed over the document digest as the
+    # message, i.e. PSS over SHA-256(digest). Hashing the 32-byte digest here
+    # and signing it as Prehashed yields the exact same signatures without
+    # ever touching the document bytes again.
+    return hashlib.sha256(digest).digest()
+
+
+class RsaPssSigner:
+    """
+    RSA-2048 with PSS padding. Key generation is slow, so keys come from the key pool.
+    """
+
+    name = RSA_PSS
+    private_key_type = rsa.RSAPrivateKey
+    public_key_type = rsa.RSAPublicKey
+    pooled = True
+
+    def generate_key(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def sign(self, digest, private_key):
+        return private_key.sign(_signed_message_hash(digest), PSS_PADDING, Prehashed(hashes.SHA256()))
+
+    def verify(self, digest, signature, public_key):
+        public_key.verify(signature, _signed_message_hash(digest), PSS_PADDING, Prehashed(hashes.SHA256()))
+
+
+class EcdsaP256Signer:
+    """
+    ECDSA over NIST P-256 with SHA-256, DER encoded signatures.
+    """
+
+    name = ECDSA_P256
+    private_key_type = ec.EllipticCurvePrivateKey
+    public_key_type = ec.EllipticCurvePublicKey
+    pooled = False
+
+    def generate_key(self):
+        return ec.generate_private_key(ec.SECP256R1())
+
+    def sign(self, digest, private_key):
+        return private_key.sign(_signed_message_hash(digest), ec.ECDSA(Prehashed(hashes.SHA256())))
+
+    def verify(self, digest, signature, public_key):
+        if not isinstance(public_key.curve, ec.SECP256R1):
+            raise InvalidSignature("Not a P-256 key")
+        public_key.verify(signature, _signed_message_hash(digest), ec.ECDSA(Prehashed(hashes.SHA256())))
+
+
+class Ed25519Signer:
+    """
+    Ed25519 over the 32-byte digest itself (the algorithm hashes internally).
+    """
+
+    name = ED25519
+    private_key_type = ed25519.Ed25519PrivateKey
+    public_key_type = ed25519.Ed25519PublicKey
+    pooled = False
+
+    def generate_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, digest, private_key):
+        return private_key.sign(digest)
+
+    def verify(self, digest, signature, public_key):
+        public_key.verify(signature, digest)
+
+
+SIGNERS = {signer.name: signer for signer in (RsaPssSigner(), EcdsaP256Signer(), Ed25519Signer())}
+
+
+def get_signer(algorithm):
+    try:
+        return SIGNERS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown signature algorithm: {algorithm}. Available: {', '.join(SIGNERS)}")
+
+
+def key_algorithm(key):
+    """
+    Algorithm identifier of a private or public key.
+    """
+    for signer in SIGNERS.values():
+        if isinstance(key, (signer.private_key_type, signer.public_key_type)):
+            return signer.name
+    raise ValueError(f"Unsupported key type: {type(key).__name__}")
+
+
+@timed("sign")
+def sign_digest(digest, private_key):
+    """
+    Sign a precomputed SHA-256 document digest with the algorithm of the key.
+    """
+    return get_signer(key_algorithm(private_key)).sign(digest, private_key)
+
+
+@timed("verify")
+def verify_digest(digest, signature, public_key, algorithm=None):
+    """
+    Verify a signature against a precomputed SHA-256 document digest.
+
+    With `algorithm`, a public key of any other type is rejected.
+    """
+    try:
+        if algorithm is not None and key_algorithm(public_key) != algorithm:
+            raise InvalidSignature(f"Key does not match {algorithm}")
+        get_signer(key_algorithm(public_key)).verify(digest, signature, public_key)
+        return True
+    except InvalidSignature as e:
+        # A mismatch is an expected answer, not an error
+        logger.debug("Verification failed: %s", e)
+        return False
+    except Exception:
+        logger.warning("Verification failed", exc_info=True)
+        return False
+
 
 def sign_document(document_content, private_key):
     # Ensure document_content is in bytes
     if isinstance(document_content, str):
         document_content = document_content.encode()  # Encode only if it’s a string
 
-    # Hash the document content
-    document_hash = hashes.Hash(hashes.SHA256())
-    document_hash.update(document_content)
-    digest = document_hash.finalize()
-
-    # Sign the hashed document content
-    signature = private_key.sign(
-        digest,
-        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
-        hashes.SHA256()
-    )
-    return signature
+    # Hash the document content and sign the digest
+    return sign_digest(hashlib.sha256(document_content).digest(), private_key)
 
 def verify_signature(document_content, signature, public_key):
     # Ensure document_content is in bytes
     if isinstance(document_content, str):
         document_content = document_content.encode()
 
-    # Hash the document content
-    document_hash = hashes.Hash(hashes.SHA256())
-    document_hash.update(document_content)
-    digest = document_hash.finalize()
-
-    try:
-        # Verify the document signature using the public key
-        public_key.verify(
-            signature,
-            digest,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return True
-    except Exception as e:
-        print("Verification failed:", e)
-        return False
\ No newline at end of file
+    # Hash the document content and verify the signature over the digest
+    return verify_digest(hashlib.sha256(document_content).digest(), signature, public_key)
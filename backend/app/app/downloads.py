@@ -0,0 +1,222 @@
+import asyncio
+import io
+import os
+import re
+import zipfile
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+# Signed copies are streamed in 256 KB chunks
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def document_etag(document, stat):
+    """
+    Strong ETag of a signed copy: its SHA-256 when known, else its size and mtime.
+    """
+    if document.signed_hash:
+        return quote_etag(document.signed_hash)
+    return quote_etag(f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single "bytes=" range, None to send
+    the whole file, or raise ValueError when the range cannot be satisfied.
+
+    Multiple ranges are answered with the whole file, as RFC 9110 allows.
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _file_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _afile_range(path, start, end):
+    # Reads run on the thread pool so a large download never blocks the event loop
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _sendfile_response(file_field):
+    # Hand the transfer to the front proxy; it also takes care of Range requests
+    response = HttpResponse(content_type="application/pdf")
+    if settings.DOWNLOAD_SENDFILE == "x-accel-redirect":
+        # Internal location mapped onto MEDIA_ROOT by the proxy; being a URI path, the name is percent-encoded
+        response["X-Accel-Redirect"] = settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(file_field.name)
+    else:
+        # mod_xsendfile unescapes the path (XSendFileUnescape, on by default)
+        response["X-Sendfile"] = quote(os.path.abspath(file_field.path))
+    return response
+
+
+def serve_document(request, document, filename, asynchronous=False):
+    """
+    Send the signed copy of a document with conditional GET, Range and
+    optional X-Sendfile / X-Accel-Redirect support.
+
+    With `asynchronous`, the body is an async iterator for async views.
+    """
+    path = document.pdf_file.path
+    stat = os.stat(path)
+    etag = document_etag(document, stat)
+    last_modified = http_date(stat.st_mtime)
+
+    # 304 / 412 answers to If-None-Match, If-Modified-Since, If-Match and If-Unmodified-Since
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime),
+    )
+    if response is None:
+        if settings.DOWNLOAD_SENDFILE:
+            response = _sendfile_response(document.pdf_file)
+        else:
+            response = _range_or_file_response(request, path, stat.st_size, etag, asynchronous)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    if response.status_code in (200, 206):
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+def _range_or_file_response(request, path, size, etag, asynchronous=False):
+    range_header = request.headers.get("Range")
+    # A Range is only honoured for the representation the client already has
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range and if_range != etag:
+        range_header = None
+
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None and not asynchronous:
+        # FileResponse lets the WSGI server use sendfile() when it can
+        response = FileResponse(open(path, "rb"), content_type="application/pdf")
+    elif byte_range is None:
+        response = StreamingHttpResponse(_afile_range(path, 0, size - 1), content_type="application/pdf")
+        response["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        chunks = _afile_range(path, start, end) if asynchronous else _file_range(path, start, end)
+        response = StreamingHttpResponse(chunks, status=206, content_type="application/pdf")
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Write-only sink for ZipFile that hands back whatever was written since the last drain.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _archive_names(documents):
+    # Unique "<name>.pdf" entries; duplicate names get the document ID appended
+    seen = set()
+    for document in documents:
+        base = document.document_name or document.document_id
+        name = f"{base}.pdf"
+        if name in seen:
+            name = f"{base}-{document.document_id}.pdf"
+        seen.add(name)
+        yield name, document
+
+
+def _nonempty(data):
+    if data:
+        yield data
+
+
+def stream_zip(documents):
+    """
+    Yield a zip archive of the signed copies chunk by chunk.
+
+    The archive is never held in memory: ZipFile writes to an unseekable
+    sink (so sizes go into data descriptors) and each chunk is yielded as
+    soon as it is written. PDFs are already compressed, so they are stored.
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name, document in _archive_names(documents):
+            if not document.pdf_file or not os.path.exists(document.pdf_file.path):
+                continue
+            info = zipfile.ZipInfo(name, date_time=document.created_at.astimezone(timezone.utc).timetuple()[:6])
+            with archive.open(info, mode="w", force_zip64=True) as entry, open(document.pdf_file.path, "rb") as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    entry.write(chunk)
+                    yield from _nonempty(sink.drain())
+            # The data descriptor is written when the entry closes
+            yield from _nonempty(sink.drain())
+    # Central directory
+    yield from _nonempty(sink.drain())
+
+
+def zip_export_response(documents):
+    response = StreamingHttpResponse(stream_zip(documents), content_type="application/zip")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    response["Content-Disposition"] = content_disposition_header(True, f"documents-{stamp}.zip")
+    return response
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+class ExtractionResultCache:
+    """
+    On-disk cache of extracted and OCRed text, shared by every process on the host.
+
+    Entries are keyed by the SHA-256 of the input bytes together with the
+    extractor configuration, so changing the engine, language or
+    preprocessing never returns stale text. Reads bump the file's mtime and
+    the least recently used entries are evicted once the total size exceeds
+    MAX_BYTES.
+    """
+
+    def __init__(self, options=None):
+        self._options = options
+        self._lock = threading.Lock()
+        self._size = None  # Bytes on disk, measured on first write
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def options(self):
+        return self._options or settings.EXTRACTION_CACHE
+
+    @property
+    def enabled(self):
+        return self.options["ENABLED"]
+
+    @property
+    def location(self):
+        return str(self.options["LOCATION"])
+
+    def key(self, content_digest, config):
+        # The same bytes read with another configuration are a different entry
+        config_json = json.dumps(config, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{content_digest}:{config_json}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.location, key[:2], key + ".txt")
+
+    def _entries(self):
+        # (mtime, size, path) of every entry on disk
+        entries = []
+        for directory, _, file_names in os.walk(self.location):
+            for file_name in file_names:
+                if file_name.endswith(".txt"):
+                    path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as entry:
+                text = entry.read()
+            # Mark the entry as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def set(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as entry:
+            entry.write(text)
+        # A rewritten entry only adds the difference in size
+        try:
+            replaced_size = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += os.path.getsize(path) - replaced_size
+            if self._size > self.options["MAX_BYTES"]:
+                self._evict()
+
+    def _evict(self):
+        # Drop the least recently used entries until the cache is back under 90% of its budget
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        target = self.options["MAX_BYTES"] * 0.9
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def get_or_extract(self, content_digest, config, extract, bypass=False):
+        """
+        Return the cached text for these bytes and extractor config, or run
+        `extract()` and store its result.
+
+        With `bypass` (or the cache disabled) the extractor always runs and
+        nothing is read or written.
+        """
+        if bypass or not self.enabled:
+            return extract()
+
+        key = self.key(content_digest, config)
+        text = self.get(key)
+        if text is None:
+            text = extract()
+            self.set(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": self._size,
+                "max_bytes": self.options["MAX_BYTES"],
+            }
+
+
+extraction_cache = ExtractionResultCache()
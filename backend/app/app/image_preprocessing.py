@@ -0,0 +1,167 @@
+"""
+Image preprocessing for OCR, implemented with vectorized NumPy operations.
+
+Nothing in this module touches Django, so it can run in worker processes.
+"""
+import time
+
+import numpy as np
+from PIL import Image
+
+# Letter height in inches, used to estimate the resolution of photos without DPI metadata
+PAGE_HEIGHT_INCHES = 11
+# Cameras and many scanners write 72 or 96 DPI whatever the real resolution; below this,
+# metadata that would make the image larger than a page is ignored
+MIN_PLAUSIBLE_DPI = 150
+
+# Adaptive threshold (Bradley-Roth): a pixel is ink when it is this much darker than its neighbourhood
+THRESHOLD_SENSITIVITY = 0.15
+# Rows thresholded at a time
+THRESHOLD_BAND_ROWS = 256
+
+# Deskew searches this range of angles, in degrees, on an image at most DESKEW_MAX_SIDE pixels wide
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.25
+DESKEW_MAX_SIDE = 1000
+
+
+def _grayscale(image, target_dpi):
+    return image.convert("L")
+
+
+def _downscale(image, target_dpi):
+    # Shrink to the resolution Tesseract needs instead of blindly upscaling;
+    # photos without plausible DPI metadata are assumed to show one full page
+    dpi = image.info.get("dpi", (None,))[0]
+    if dpi and float(dpi) < MIN_PLAUSIBLE_DPI and max(image.size) / float(dpi) > PAGE_HEIGHT_INCHES:
+        dpi = None
+    if dpi:
+        scale = target_dpi / float(dpi)
+    else:
+        scale = PAGE_HEIGHT_INCHES * target_dpi / max(image.size)
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.BOX)
+
+
+def _median3(a, b, c):
+    return np.maximum(np.minimum(a, b), np.minimum(np.maximum(a, b), c))
+
+
+def _denoise(image, target_dpi):
+    # 3x3 median filter as a min/max network: sort each vertical triple, then the
+    # median of nine is the median of (max of minima, median of medians, min of maxima)
+    # over the three horizontal neighbours
+    pixels = np.asarray(image.convert("L"))
+    padded = np.pad(pixels, 1, mode="edge")
+    up, middle, down = padded[:-2], padded[1:-1], padded[2:]
+    low = np.minimum(np.minimum(up, middle), down)
+    mid = _median3(up, middle, down)
+    high = np.maximum(np.maximum(up, middle), down)
+
+    left, centre, right = slice(None, -2), slice(1, -1), slice(2, None)
+    max_low = np.maximum(np.maximum(low[:, left], low[:, centre]), low[:, right])
+    med_mid = _median3(mid[:, left], mid[:, centre], mid[:, right])
+    min_high = np.minimum(np.minimum(high[:, left], high[:, centre]), high[:, right])
+    return Image.fromarray(_median3(max_low, med_mid, min_high))
+
+
+def _deskew_angle(pixels):
+    # Rotate the ink pixel coordinates through every candidate angle and keep the
+    # one whose row histogram is sharpest, i.e. where text lines are horizontal
+    step = max(1, max(pixels.shape) // DESKEW_MAX_SIDE)
+    small = pixels[::step, ::step]
+    ys, xs = np.nonzero(small < small.mean() - small.std())
+    if len(ys) < 2:
+        return 0.0
+
+    # One angle at a time, so memory stays proportional to the number of ink pixels
+    angles = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP)
+    scores = []
+    for radians in np.deg2rad(angles):
+        rows = np.rint(np.cos(radians) * ys - np.sin(radians) * xs).astype(np.int64)
+        histogram = np.bincount(rows - rows.min())
+        scores.append(np.square(np.diff(histogram)).sum())
+    return float(angles[int(np.argmax(scores))])
+
+
+def _deskew(image, target_dpi):
+    image = image.convert("L")
+    angle = _deskew_angle(np.asarray(image))
+    if not angle:
+        return image
+    return image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+
+def _window_sums(values, half, axis, start=0, stop=None):
+    # Sum over a sliding window of 2 * half + 1 along one axis, from a cumulative sum,
+    # at positions start to stop of that axis
+    length = values.shape[axis]
+    positions = np.arange(start, length if stop is None else stop)
+    cumulative = np.concatenate([np.zeros_like(values.take([0], axis=axis), dtype=np.int64), values.cumsum(axis=axis, dtype=np.int64)], axis=axis)
+    lower = np.clip(positions - half, 0, length)
+    upper = np.clip(positions + half + 1, 0, length)
+    return cumulative.take(upper, axis=axis) - cumulative.take(lower, axis=axis), upper - lower
+
+
+def _threshold(image, target_dpi):
+    # Bradley-Roth adaptive threshold: window means come from separable running
+    # sums, so each pixel costs the same regardless of the window size. Bands of
+    # rows (plus the window above and below them) are processed in turn to keep
+    # the 64-bit sums small on large scans
+    pixels = np.asarray(image.convert("L"))
+    height = pixels.shape[0]
+    half = max(7, max(pixels.shape) // 64)
+
+    # Integer form of pixel < (1 - THRESHOLD_SENSITIVITY) * window mean
+    sensitivity = int(round((1 - THRESHOLD_SENSITIVITY) * 100))
+    output = np.empty_like(pixels)
+    for top in range(0, height, THRESHOLD_BAND_ROWS):
+        bottom = min(top + THRESHOLD_BAND_ROWS, height)
+        first = max(0, top - half)
+        row_sums, row_counts = _window_sums(pixels[first:bottom + half], half, axis=1)
+        window_sums, column_counts = _window_sums(row_sums, half, axis=0, start=top - first, stop=bottom - first)
+        area = column_counts[:, None] * row_counts[None, :]
+
+        ink = pixels[top:bottom] * area * 100 < window_sums * sensitivity
+        output[top:bottom] = np.where(ink, 0, 255)
+    return Image.fromarray(output)
+
+
+# Stages in the order they are applied; requests pick a subset by name
+PREPROCESSING_STAGES = {
+    "grayscale": _grayscale,
+    "downscale": _downscale,
+    "denoise": _denoise,
+    "deskew": _deskew,
+    "threshold": _threshold,
+}
+
+
+def parse_stages(value):
+    """
+    Parse a comma-separated list of stage names ("none" for no preprocessing).
+    """
+    names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    if names == ["none"]:
+        return []
+    unknown = [name for name in names if name not in PREPROCESSING_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stages: {', '.join(unknown)}. Available: {', '.join(PREPROCESSING_STAGES)}")
+    return names
+
+
+def preprocess_image(image, stages, target_dpi=300):
+    """
+    Run the selected preprocessing stages over an image.
+
+    Returns (image, timings) where timings maps each stage to its duration in milliseconds.
+    """
+    timings = {}
+    for name, stage in PREPROCESSING_STAGES.items():
+        if name in stages:
+            start = time.perf_counter()
+            image = stage(image, target_dpi)
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    return image, timings
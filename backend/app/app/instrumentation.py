@@ -0,0 +1,235 @@
+"""
+Per-stage timing of the signing and verification pipelines.
+
+span() and timed() measure a stage into an in-process histogram (served in
+Prometheus text format by the metrics view) and into the Server-Timing header
+of the request being handled. With METRICS_ENABLED off they cost one
+function call.
+
+Settings are only read once Django is configured, so modules that also run in
+spawned worker processes can be instrumented; spans there are not recorded.
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+
+STAGE_METRIC = "pipeline_stage_duration_seconds"
+REQUEST_METRIC = "http_request_duration_seconds"
+
+METRIC_HELP = {
+    STAGE_METRIC: "Time spent in each signing and verification stage.",
+    REQUEST_METRIC: "Time from receiving a request to returning its response.",
+}
+
+# Stage durations (seconds) of the request being handled, or None outside of one
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+_NOOP = contextlib.nullcontext()
+
+# METRICS_ENABLED, read once per process so disabled spans skip the settings lookup
+_enabled = None
+
+
+def enabled():
+    global _enabled
+    if _enabled is None:
+        if not settings.configured:
+            return False
+        _enabled = bool(settings.METRICS_ENABLED)
+    return _enabled
+
+
+def _reset_enabled(setting, **kwargs):
+    # override_settings() in tests
+    global _enabled
+    if setting == "METRICS_ENABLED":
+        _enabled = None
+
+
+setting_changed.connect(_reset_enabled)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # The first bucket whose upper bound is >= value; the last slot is +Inf
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Histograms keyed by metric name and label values, shared by every thread of the process.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric, labels, value):
+        key = (metric, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(settings.METRICS_BUCKETS)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """
+        Text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            snapshot = sorted(
+                (metric, labels, histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for (metric, labels), histogram in self._histograms.items()
+            )
+
+        lines, described = [], set()
+        for metric, labels, buckets, counts, total, count in snapshot:
+            if metric not in described:
+                lines.append(f"# HELP {metric} {METRIC_HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                described.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{_series(metric + '_bucket', labels + (('le', le),))} {cumulative}")
+            lines.append(f"{_series(metric + '_sum', labels)} {total!r}")
+            lines.append(f"{_series(metric + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return name + "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+
+
+def record(stage, seconds):
+    registry.observe(STAGE_METRIC, (("stage", stage),), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.stage, time.perf_counter() - self.start)
+
+
+def span(stage):
+    """
+    Context manager timing a block as `stage`.
+    """
+    return _Span(stage) if enabled() else _NOOP
+
+
+def timed(stage):
+    """
+    Decorator timing every call of a function as `stage`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with _Span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(timings, total):
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Record the latency of every request per view, and break it down by stage
+    in a Server-Timing header.
+
+    Streaming responses are timed until the view returns; stages that run
+    while the body streams, or on other threads, only reach the histograms.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI, stay async so async views are not pushed onto a thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, total):
+        view = request.resolver_match.url_name if request.resolver_match else "unmatched"
+        registry.observe(REQUEST_METRIC, (("method", request.method), ("view", view or "unnamed")), total)
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = server_timing_header(timings, total)
+        return response
@@ -0,0 +1,161 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SigningJob
+from .signing import store_upload, sign_stored_document
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_signing_job(uploaded_file, document_name=None, user=None):
+    """
+    Accept an upload for asynchronous signing and return the queued job.
+
+    Only the blob store write happens here; the signing pipeline runs on the
+    worker pool.
+    """
+    job = SigningJob.objects.create(
+        job_id=str(uuid.uuid4()),
+        file_name=uploaded_file.name,
+        document_name=document_name,
+        content_hash=store_upload(uploaded_file),
+        user=user,
+    )
+    worker_pool.notify()
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to running and return it.
+
+    Jobs left running past SIGNING_JOB_LEASE (their worker crashed or was
+    killed) are claimed again. The conditional UPDATE makes claiming safe
+    across threads and across worker processes sharing the database.
+    """
+    while True:
+        expired = timezone.now() - timedelta(seconds=settings.SIGNING_JOB_LEASE)
+        job = (
+            SigningJob.objects.filter(
+                Q(status=SigningJob.PENDING) | Q(status=SigningJob.RUNNING, started_at__lt=expired)
+            )
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        claimed = SigningJob.objects.filter(pk=job.pk, status=job.status, started_at=job.started_at).update(
+            status=SigningJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """
+    Run the signing pipeline for a claimed job and record the outcome.
+
+    The outcome is only recorded while the claim still holds; a worker whose
+    job was taken over after its lease expired discards its result.
+    """
+    try:
+        document = sign_stored_document(
+            job.content_hash, job.file_name, job.document_name, tenant=job.user_id, owner_id=job.user_id, save=False
+        )
+        job.status = SigningJob.SUCCEEDED
+    except Exception as e:
+        document = None
+        job.status = SigningJob.FAILED
+        job.error = str(e)
+
+    # The document and the job outcome are written in one short transaction, after all the slow work
+    job.finished_at = timezone.now()
+    with transaction.atomic():
+        if document is not None:
+            document.save()
+        recorded = SigningJob.objects.filter(pk=job.pk, status=SigningJob.RUNNING, started_at=job.started_at).update(
+            status=job.status, document=document, error=job.error, finished_at=job.finished_at
+        )
+        if not recorded:
+            transaction.set_rollback(True)
+    if not recorded:
+        if document is not None:
+            document.pdf_file.storage.delete(document.pdf_file.name)
+        job.refresh_from_db()
+        return job
+
+    job.document = document
+    return job
+
+
+def process_pending_jobs(limit=None):
+    """
+    Run pending jobs in the calling thread until the queue is empty.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+class SigningWorkerPool:
+    """
+    Local pool of worker threads draining the database-backed job queue.
+
+    Workers are woken when a job is enqueued in this process and otherwise
+    poll, so jobs queued by other processes are picked up too. With
+    SIGNING_JOB_AUTOSTART they start when the app loads, so jobs queued before
+    a restart are drained.
+    """
+
+    def __init__(self, size, poll_interval):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.size):
+                thread = threading.Thread(target=self._run, name=f"signing-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        if self.size:
+            self.start()
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            close_old_connections()
+            try:
+                job = claim_next_job()
+                if job is not None:
+                    run_job(job)
+                    continue
+            except Exception:
+                logger.exception("Signing worker error")
+            finally:
+                close_old_connections()
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+worker_pool = SigningWorkerPool(settings.SIGNING_JOB_WORKERS, settings.SIGNING_JOB_POLL_INTERVAL)
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import queue
+import threading
+
+from django.conf import settings
+from cryptography.hazmat.primitives import serialization
+
+from .digital_signature import RSA_PSS, get_signer
+from .instrumentation import timed
+
+
+def generate_rsa_key():
+    """
+    Generate a fresh RSA-2048 private key for signing.
+    """
+    return get_signer(RSA_PSS).generate_key()
+
+
+def public_key_pem(private_key):
+    """
+    Serialize the public half of a private key as PEM (SubjectPublicKeyInfo).
+    """
+    return private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def key_fingerprint(private_key):
+    """
+    Key ID: SHA-256 over the DER encoded public key.
+    """
+    public_der = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return hashlib.sha256(public_der).hexdigest()
+
+
+class KeyPool:
+    """
+    Bounded pool of pre-generated private keys.
+
+    A daemon thread keeps the pool filled up to `size` keys and is woken
+    whenever the depth drops to `low_water`. When the pool is empty the
+    caller generates a key inline, which is counted as a miss.
+    """
+
+    def __init__(self, size, low_water, key_factory=generate_rsa_key):
+        self.size = size
+        self.low_water = low_water
+        self.key_factory = key_factory
+        self._keys = queue.Queue(maxsize=size)
+        self._refill = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    def start(self):
+        # Start the refill worker once, on first use
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="key-pool-refill", daemon=True)
+                self._worker.start()
+                self._refill.set()
+
+    def _run(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+
+            # Top the pool back up to capacity
+            while not self._keys.full():
+                key = self.key_factory()
+                with self._lock:
+                    self.generated += 1
+                try:
+                    self._keys.put_nowait(key)
+                except queue.Full:
+                    break
+
+    def acquire(self):
+        """
+        Take a key from the pool, generating one inline on a miss.
+        """
+        self.start()
+        try:
+            key = self._keys.get_nowait()
+            with self._lock:
+                self.hits += 1
+        except queue.Empty:
+            with self._lock:
+                self.misses += 1
+            key = self.key_factory()
+
+        if self._keys.qsize() <= self.low_water:
+            self._refill.set()
+        return key
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self._keys.qsize(),
+                "capacity": self.size,
+                "low_water": self.low_water,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+            }
+
+
+# Only RSA keys are pooled; ECDSA and Ed25519 keys are cheaper to generate than to queue
+key_pool = KeyPool(settings.KEY_POOL_SIZE, settings.KEY_POOL_LOW_WATER)
+
+# Long-lived keys (shared or per tenant), loaded once per process
+_long_lived_keys = {}
+_long_lived_lock = threading.Lock()
+
+
+def _load_or_create_key(name, signer):
+    # RSA keys keep their original file names; other algorithms get a suffix
+    if signer.name != RSA_PSS:
+        name = f"{name}-{signer.name}"
+    with _long_lived_lock:
+        if name in _long_lived_keys:
+            return _long_lived_keys[name]
+
+        key_dir = settings.SIGNING_KEY_DIR
+        os.makedirs(key_dir, exist_ok=True)
+        key_path = os.path.join(key_dir, f"{name}.pem")
+
+        if os.path.exists(key_path):
+            with open(key_path, "rb") as key_file:
+                private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+        else:
+            private_key = signer.generate_key()
+            pem = private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            )
+            # Only the owner may read the private key
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as key_file:
+                key_file.write(pem)
+
+        entry = (private_key, key_fingerprint(private_key))
+        _long_lived_keys[name] = entry
+        return entry
+
+
+@timed("signing_key")
+def get_signing_key(tenant=None, algorithm=None):
+    """
+    Return (private_key, key_id) according to settings.SIGNING_KEY_MODE, for
+    `algorithm` or else settings.SIGNATURE_ALGORITHM.
+
+    - "pool":   a fresh per-document key taken from the key pool (RSA) or generated inline
+    - "shared": one long-lived key for every document
+    - "tenant": one long-lived key per tenant (falls back to the shared key)
+    """
+    mode = settings.SIGNING_KEY_MODE
+    signer = get_signer(algorithm or settings.SIGNATURE_ALGORITHM)
+
+    if mode == "shared" or (mode == "tenant" and tenant is None):
+        return _load_or_create_key("shared", signer)
+    if mode == "tenant":
+        return _load_or_create_key(f"tenant-{tenant}", signer)
+    if mode == "pool":
+        private_key = key_pool.acquire() if signer.pooled else signer.generate_key()
+        return private_key, key_fingerprint(private_key)
+
+    raise ValueError(f"Unknown SIGNING_KEY_MODE: {mode}")
@@ -0,0 +1,436 @@
+"""
+Offline load generation against a local server.
+
+The harness boots the app in a child process (a threaded WSGI server over a
+throwaway database and media directory, see serve()), or targets a running
+server, then drives a weighted mix of requests from asyncio clients at each
+level of a concurrency sweep. Clients speak HTTP/1.1 over asyncio streams
+with keep-alive, so nothing beyond the standard library is needed.
+
+Reports give per-endpoint p50/p95/p99 latency, throughput and error rate per
+concurrency level; see `manage.py load_test`.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from .benchmarks import SEED, generate_pdf
+
+# Relative weights of the default workload: mostly verification, some signing
+DEFAULT_MIX = {"sign": 1, "verify": 4, "verify_get": 4, "list": 2, "download": 2, "token": 1}
+SEED_DOCUMENTS = 5
+# Distinct PDFs cycled through by the sign operation, so uploads rarely repeat
+CORPUS_SIZE = 50
+
+
+def parse_mix(value):
+    """
+    Parse "sign=1,verify=4" into {"sign": 1.0, "verify": 4.0}.
+    """
+    mix = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        name, _, weight = entry.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}. Available: {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name}: {weight}")
+    if not mix or not any(mix.values()):
+        raise ValueError("The workload mix needs at least one operation with a positive weight.")
+    return mix
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def encode_multipart(fields, files):
+    """
+    Encode form fields and {name: (filename, bytes, content type)} files as multipart/form-data.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class HttpClient:
+    """
+    Minimal HTTP/1.1 client over one keep-alive connection.
+    """
+
+    def __init__(self, host, port, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", headers=None):
+        """
+        Return (status, headers, body). A request on a connection the server
+        already closed is retried once on a new one.
+        """
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if not reused or attempt:
+                    raise
+
+    async def _exchange(self, method, path, body, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            response_body = b"".join(chunks)
+        elif "content-length" in response_headers:
+            response_body = await self.reader.readexactly(int(response_headers["content-length"]))
+        else:
+            response_body = await self.reader.read()
+            response_headers["connection"] = "close"
+
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response_headers, response_body
+
+
+class Session:
+    """
+    Shared state of a load test: credentials, the current access token and
+    the documents available to verify and download.
+    """
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.access_token = None
+        # (primary key, document_id, signed copy bytes)
+        self.documents = []
+        self.corpus = [generate_pdf(1, seed=SEED + i, label=f"Load test {i}") for i in range(CORPUS_SIZE)]
+        self.counter = itertools.count()
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+def _json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return {}
+
+
+async def op_token(client, session, rng):
+    body = json.dumps({"username": session.username, "password": session.password}).encode()
+    status, _, response = await client.request("POST", "/token/", body, {"Content-Type": "application/json"})
+    if status == 200:
+        session.access_token = _json(response)["access"]
+    return status == 200
+
+
+async def op_sign(client, session, rng):
+    number = next(session.counter)
+    body, content_type = encode_multipart(
+        {"document_name": f"load-{number}"},
+        {"document": (f"load-{number}.pdf", session.corpus[number % len(session.corpus)], "application/pdf")},
+    )
+    status, _, _ = await client.request(
+        "POST", "/create_signed_document/", body, {"Content-Type": content_type, **session.auth_headers()}
+    )
+    return status == 200
+
+
+async def op_verify(client, session, rng):
+    _, document_id, signed_copy = rng.choice(session.documents)
+    body, content_type = encode_multipart(
+        {"id": document_id, "full": "false"}, {"document": ("signed.pdf", signed_copy, "application/pdf")}
+    )
+    status, _, response = await client.request("POST", "/verify/", body, {"Content-Type": content_type})
+    return status == 200 and _json(response).get("verified") is True
+
+
+async def op_verify_get(client, session, rng):
+    _, document_id, _ = rng.choice(session.documents)
+    status, _, _ = await client.request("GET", "/verify/?" + urlencode({"id": document_id}))
+    return status == 200
+
+
+async def op_list(client, session, rng):
+    status, _, _ = await client.request("GET", "/documents/?page_size=20", headers=session.auth_headers())
+    return status == 200
+
+
+async def op_download(client, session, rng):
+    pk, _, _ = rng.choice(session.documents)
+    status, _, _ = await client.request("GET", f"/download/{pk}/", headers=session.auth_headers())
+    return status == 200
+
+
+OPERATIONS = {
+    "sign": op_sign,
+    "verify": op_verify,
+    "verify_get": op_verify_get,
+    "list": op_list,
+    "download": op_download,
+    "token": op_token,
+}
+
+
+async def prepare(host, port, session, seed_documents=SEED_DOCUMENTS):
+    """
+    Log in and sign the documents that verify and download requests pick from.
+    """
+    client = HttpClient(host, port)
+    try:
+        if not await op_token(client, session, None):
+            raise RuntimeError("Could not obtain an access token; check the credentials.")
+
+        # Signing returns the document ID that verification takes
+        signed = {}
+        for number in range(seed_documents):
+            name = f"load-seed-{uuid.uuid4().hex[:12]}"
+            body, content_type = encode_multipart(
+                {"document_name": name},
+                {"document": (f"{name}.pdf", session.corpus[number % len(session.corpus)], "application/pdf")},
+            )
+            status, _, response = await client.request(
+                "POST", "/create_signed_document/", body, {"Content-Type": content_type, **session.auth_headers()}
+            )
+            if status != 200:
+                raise RuntimeError(f"Could not sign the seed documents: HTTP {status} {response[:200]!r}")
+            signed[name] = _json(response)["document_id"]
+
+        # The listing gives the primary keys downloads take; the downloads give the signed copies to verify
+        status, _, response = await client.request(
+            "GET", f"/documents/?page_size={max(seed_documents, 20)}", headers=session.auth_headers()
+        )
+        for row in _json(response).get("results", []):
+            if row["document_name"] not in signed:
+                continue
+            status, _, signed_copy = await client.request(
+                "GET", f"/download/{row['document_id']}/", headers=session.auth_headers()
+            )
+            if status == 200:
+                session.documents.append((row["document_id"], signed[row["document_name"]], signed_copy))
+        if not session.documents:
+            raise RuntimeError("None of the seed documents could be downloaded.")
+    finally:
+        await client.close()
+
+
+async def run_level(host, port, session, mix, concurrency, duration, seed=SEED):
+    """
+    Run `concurrency` clients for `duration` seconds and return the per-endpoint report.
+    """
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(index):
+        client = HttpClient(host, port)
+        rng = random.Random(seed * 1000 + index)
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok = await OPERATIONS[name](client, session, rng)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    ok = False
+                    await client.close()
+                samples[name].append(time.perf_counter() - start)
+                if not ok:
+                    errors[name] += 1
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in names:
+        ordered = sorted(samples[name])
+        endpoints[name] = {
+            "requests": len(ordered),
+            "errors": errors[name],
+            "error_rate": round(errors[name] / len(ordered), 4) if ordered else 0.0,
+            "throughput_rps": round(len(ordered) / elapsed, 3),
+            **{
+                key: round(percentile(ordered, fraction) * 1000, 3) if ordered else None
+                for key, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99))
+            },
+        }
+    total = sum(len(values) for values in samples.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 3),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def run_sweep(host, port, session, mix, concurrency_levels, duration, seed_documents=SEED_DOCUMENTS, report=None):
+    await prepare(host, port, session, seed_documents)
+    levels = []
+    for concurrency in concurrency_levels:
+        level = await run_level(host, port, session, mix, concurrency, duration)
+        levels.append(level)
+        if report is not None:
+            report(level)
+    return levels
+
+
+def serve(port, username, password, on_bind):
+    """
+    Serve the app on 127.0.0.1 with a threaded WSGI server over a throwaway
+    database and media directory until SIGTERM or SIGINT.
+    """
+    import logging
+
+    from django.contrib.auth.models import User
+    from django.core.servers.basehttp import WSGIServer, get_internal_wsgi_application, run
+    from django.test import override_settings
+
+    from .benchmarks import benchmark_environment
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    class LoadTestServer(WSGIServer):
+        # Connection bursts of a large sweep level must not overflow the accept queue
+        request_queue_size = 1024
+
+        def get_request(self):
+            # The handler writes headers and body separately; with Nagle's algorithm on,
+            # the body waits for the client's delayed ACK and every response takes 40 ms more
+            connection, address = super().get_request()
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return connection, address
+
+    with benchmark_environment(), override_settings(ALLOWED_HOSTS=["127.0.0.1", "localhost"]):
+        User.objects.create_user(username, password=password)
+        # Loading the WSGI application configures logging again, so quieten the access log afterwards:
+        # one log line per request would dominate the server's own work
+        application = get_internal_wsgi_application()
+        logging.getLogger("django.server").setLevel(logging.ERROR)
+        try:
+            run("127.0.0.1", port, application, threading=True, on_bind=on_bind, server_cls=LoadTestServer)
+        except KeyboardInterrupt:
+            pass
+
+
+class LocalServer:
+    """
+    `manage.py load_test --serve` in a child process, stopped on exit.
+    """
+
+    def __init__(self, manage_py, startup_timeout=60):
+        self.manage_py = manage_py
+        self.startup_timeout = startup_timeout
+        self.username = "load-test"
+        self.password = secrets.token_urlsafe(16)
+        self.process = None
+        self.port = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, self.manage_py, "load_test", "--serve", "--port", "0", "--username", self.username],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+        # The password travels over stdin rather than the command line
+        self.process.stdin.write(self.password + "\n")
+        self.process.stdin.close()
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            line = self.process.stdout.readline()
+            if not line:
+                break
+            if line.startswith("LISTENING "):
+                self.port = int(line.split()[1])
+                return self
+        self.__exit__(None, None, None)
+        raise RuntimeError("The load test server did not start.")
+
+    def __exit__(self, *exc_info):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def parse_target(url):
+    parts = urlsplit(url)
+    if parts.scheme != "http" or not parts.hostname:
+        raise ValueError("The target must be an http:// URL.")
+    return parts.hostname, parts.port or 80
@@ -0,0 +1,39 @@
+import hashlib
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.digital_signature import SIGNERS
+
+
+def _rate(operation, iterations):
+    # Operations per second over `iterations` calls
+    start = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    return iterations / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = "Measure key generation, signing and verification throughput of every signature algorithm on this machine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--algorithm", action="append", choices=list(SIGNERS), help="Benchmark only these algorithms")
+        parser.add_argument("--iterations", type=int, default=500, help="Signatures and verifications per algorithm")
+        parser.add_argument("--keygen-iterations", type=int, default=20, help="Keys generated per algorithm")
+
+    def handle(self, *args, **options):
+        digests = [hashlib.sha256(str(i).encode()).digest() for i in range(options["iterations"])]
+
+        self.stdout.write(f"{'algorithm':<20}{'keygen/s':>12}{'sign/s':>12}{'verify/s':>12}{'sig bytes':>12}")
+        for name in options["algorithm"] or SIGNERS:
+            signer = SIGNERS[name]
+            keygen = _rate(lambda i: signer.generate_key(), options["keygen_iterations"])
+
+            private_key = signer.generate_key()
+            public_key = private_key.public_key()
+            signatures = []
+            sign = _rate(lambda i: signatures.append(signer.sign(digests[i], private_key)), len(digests))
+            verify = _rate(lambda i: signer.verify(digests[i], signatures[i], public_key), len(digests))
+
+            self.stdout.write(f"{name:<20}{keygen:>12.1f}{sign:>12.1f}{verify:>12.1f}{len(signatures[0]):>12}")
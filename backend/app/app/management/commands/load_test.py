@@ -0,0 +1,107 @@
+import asyncio
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.load_testing import DEFAULT_MIX, SEED_DOCUMENTS, LocalServer, Session, parse_mix, parse_target, run_sweep, serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a weighted mix of signing, verification, listing, download and token requests from asyncio "
+        "clients at each level of a concurrency sweep, and report p50/p95/p99 latency, throughput and error "
+        "rate per endpoint. By default the app is served from a throwaway database on a local port; "
+        "--target drives a server that is already running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--username", help="User to log in as (created automatically for the local server)")
+        parser.add_argument("--password", help="Password of --username on the --target server")
+        parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated client counts to sweep")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+            help="Operation weights: sign, verify, verify_get, list, download, token",
+        )
+        parser.add_argument("--seed-documents", type=int, default=SEED_DOCUMENTS, help="Documents signed before the sweep")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        # Internal: run the server side of the local target
+        parser.add_argument("--serve", action="store_true", help="Only serve the app for a load test (used internally)")
+        parser.add_argument("--port", type=int, default=0, help="Port for --serve; 0 picks a free one")
+
+    def handle(self, *args, **options):
+        if options["serve"]:
+            password = sys.stdin.readline().strip()
+            serve(options["port"], options["username"] or "load-test", password, on_bind=self._announce)
+            return
+
+        try:
+            concurrency_levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not concurrency_levels or min(concurrency_levels) < 1:
+            raise CommandError("--concurrency needs at least one positive client count.")
+
+        if options["target"]:
+            if not options["username"] or not options["password"]:
+                raise CommandError("--target needs --username and --password.")
+            try:
+                host, port = parse_target(options["target"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            levels = self._sweep(host, port, Session(options["username"], options["password"]), mix, concurrency_levels, options)
+        else:
+            with LocalServer(sys.argv[0]) as server:
+                self.stdout.write(f"Serving the app on 127.0.0.1:{server.port}.")
+                session = Session(server.username, server.password)
+                levels = self._sweep("127.0.0.1", server.port, session, mix, concurrency_levels, options)
+
+        if options["output"]:
+            report = {
+                "meta": {
+                    "target": options["target"] or "local",
+                    "mix": mix,
+                    "duration_s": options["duration"],
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                },
+                "levels": levels,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}.")
+
+    def _announce(self, port):
+        # The parent reads the port from this line
+        self.stdout.write(f"LISTENING {port}")
+        self.stdout.flush()
+
+    def _sweep(self, host, port, session, mix, concurrency_levels, options):
+        try:
+            return asyncio.run(run_sweep(
+                host, port, session, mix, concurrency_levels, options["duration"],
+                seed_documents=options["seed_documents"], report=self._report_level,
+            ))
+        except (RuntimeError, OSError) as e:
+            raise CommandError(f"Load test failed: {e}")
+
+    def _report_level(self, level):
+        self.stdout.write(
+            f"\nconcurrency {level['concurrency']}: {level['requests']} requests in {level['duration_s']:.1f} s, "
+            f"{level['throughput_rps']:.1f} req/s, {level['error_rate']:.1%} errors"
+        )
+        self.stdout.write(f"  {'endpoint':<12} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, endpoint in level["endpoints"].items():
+            if not endpoint["requests"]:
+                continue
+            self.stdout.write(
+                f"  {name:<12} {endpoint['requests']:>8} {endpoint['throughput_rps']:>8.1f} {endpoint['error_rate']:>7.1%} "
+                f"{endpoint['p50_ms']:>9.1f} {endpoint['p95_ms']:>9.1f} {endpoint['p99_ms']:>9.1f}"
+            )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Document
+from app.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index and its sync triggers, and re-index every document."
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(f"Search index rebuilt for {Document.objects.count()} document(s).")
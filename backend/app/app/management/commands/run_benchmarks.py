@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks import REGRESSION_THRESHOLD, compare_results, load_report, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the signing and verification pipeline on a generated corpus: microbenchmarks of the "
+        "individual stages and end-to-end runs through the test client in a throwaway database. "
+        "With --compare, exit with an error when a result regressed against the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--compare", metavar="BASELINE", help="Compare against a report written by an earlier run")
+        parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed relative slowdown, e.g. 0.2 for 20%%")
+        parser.add_argument("--quick", action="store_true", help="Smaller corpus, for a fast sanity run")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed calls per microbenchmark")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per end-to-end run")
+        parser.add_argument("--concurrency", default="1,4", help="Comma-separated client thread counts for end-to-end runs")
+        parser.add_argument("--only", choices=["micro", "e2e"], help="Run only one kind of benchmark")
+
+    def handle(self, *args, **options):
+        try:
+            concurrency_levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+
+        report = run_suite(
+            quick=options["quick"],
+            repeat=options["repeat"],
+            concurrency_levels=concurrency_levels,
+            requests=options["requests"],
+            micro=options["only"] != "e2e",
+            end_to_end=options["only"] != "micro",
+        )
+
+        for name, result in report["results"].items():
+            if "skipped" in result:
+                self.stdout.write(f"{name:<55} skipped: {result['skipped']}")
+            elif "throughput_rps" in result:
+                self.stdout.write(
+                    f"{name:<55} {result['throughput_rps']:>9.2f} req/s  median {result.get('median_ms', 0):>9.2f} ms  "
+                    f"p95 {result.get('p95_ms', 0):>9.2f} ms  errors {result['errors']}"
+                )
+            else:
+                self.stdout.write(f"{name:<55} median {result['median_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms")
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}.")
+
+        if options["compare"]:
+            comparisons = compare_results(load_report(options["compare"]), report, options["threshold"])
+            regressions = [comparison for comparison in comparisons if comparison["regression"]]
+            for comparison in comparisons:
+                marker = "REGRESSION" if comparison["regression"] else "ok"
+                self.stdout.write(
+                    f"{comparison['name']:<55} {comparison['metric']:<15} {comparison['baseline']:>10} -> "
+                    f"{comparison['current']:>10} ({comparison['change']:+.1%}) {marker}"
+                )
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark(s) regressed by more than {options['threshold']:.0%}.")
+            self.stdout.write(f"No regressions against {options['compare']}.")
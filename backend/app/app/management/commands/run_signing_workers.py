@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.jobs import SigningWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a pool of signing workers that drains the asynchronous signing job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.SIGNING_JOB_WORKERS or 1)
+        parser.add_argument("--poll-interval", type=float, default=settings.SIGNING_JOB_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        pool = SigningWorkerPool(options["workers"], options["poll_interval"])
+        pool.start()
+        self.stdout.write(f"Started {options['workers']} signing worker(s). Press Ctrl+C to stop.")
+
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping signing workers.")
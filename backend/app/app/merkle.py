@@ -0,0 +1,244 @@
+"""
+Merkle trees over document pages, and over documents signed together.
+
+Leaves and inner nodes are domain-separated as in RFC 6962 (0x00 / 0x01
+prefixes). An odd node at the end of a level is promoted unchanged, so a
+proof only needs the leaf index and the tree size besides the sibling hashes.
+
+Nothing in this module touches Django, so it can run in worker processes.
+"""
+import hashlib
+import os
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from .instrumentation import timed
+
+DIGEST_SIZE = 32
+
+# PDFs of at least PARALLEL_MIN_BYTES (typically scans with large page images) are
+# hashed across processes in runs of PAGE_CHUNK_SIZE pages; below that, re-parsing
+# the file in every worker costs more than it saves
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+PAGE_CHUNK_SIZE = 32
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _next_level(level):
+    return [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+
+
+def merkle_root(leaves):
+    """
+    Root of a tree over already leaf-hashed values.
+    """
+    if not leaves:
+        raise ValueError("A Merkle tree needs at least one leaf.")
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def inclusion_proof(leaves, index):
+    """
+    Sibling hashes from leaf `index` up to the root.
+    """
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+
+def inclusion_proofs(leaves):
+    """
+    Inclusion proofs of every leaf, building the tree only once.
+    """
+    proofs = [[] for _ in leaves]
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        for proof, index in zip(proofs, positions):
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+        level = _next_level(level)
+        positions = [index // 2 for index in positions]
+    return proofs
+
+
+def root_from_proof(leaf, index, size, proof):
+    """
+    Recompute the root from a leaf hash and its inclusion proof; raises ValueError for malformed proofs.
+    """
+    node = leaf
+    proof = list(proof)
+    while size > 1:
+        if index % 2 or index + 1 < size:
+            if not proof:
+                raise ValueError("Inclusion proof is shorter than the tree.")
+            node = node_hash(proof.pop(0), node) if index % 2 else node_hash(node, proof.pop(0))
+        index //= 2
+        size = (size + 1) // 2
+    if proof:
+        raise ValueError("Inclusion proof is longer than the tree.")
+    return node
+
+
+def _stream_data(obj):
+    obj = obj.get_object()
+    return obj.get_data() if isinstance(obj, StreamObject) else b""
+
+
+# Back-references to the page tree: following them would hash the whole document into every page
+_BACK_REFERENCES = frozenset({"/Parent", "/P"})
+# Page attributes a page may inherit from its ancestors in the page tree
+_INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _object_digest(obj, memo, stack=()):
+    """
+    Canonical SHA-256 of a PDF object and everything it references: dictionaries
+    by sorted key, streams by their dictionary and decoded data, so the digest
+    does not depend on where objects sit in the file or how they are compressed.
+    """
+    reference = None
+    if isinstance(obj, IndirectObject):
+        reference = (obj.idnum, obj.generation)
+        if reference in memo:
+            return memo[reference]
+        if reference in stack:
+            # A cycle (e.g. an annotation and its popup); the object is already being hashed
+            return hashlib.sha256(b"cycle").digest()
+        stack = stack + (reference,)
+        obj = obj.get_object()
+
+    digest = hashlib.sha256()
+    if isinstance(obj, DictionaryObject):
+        digest.update(b"stream" if isinstance(obj, StreamObject) else b"dict")
+        for key in sorted(obj):
+            if key in _BACK_REFERENCES:
+                continue
+            # Filters and lengths only describe the encoding of the data hashed below
+            if isinstance(obj, StreamObject) and key in ("/Filter", "/DecodeParms", "/Length"):
+                continue
+            digest.update(key.encode() + _object_digest(obj.raw_get(key), memo, stack))
+        if isinstance(obj, StreamObject):
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"array")
+        for item in obj:
+            digest.update(_object_digest(item, memo, stack))
+    else:
+        digest.update(type(obj).__name__.encode() + repr(obj).encode())
+
+    result = digest.digest()
+    if reference is not None:
+        memo[reference] = result
+    return result
+
+
+def _inherited(page, key):
+    node = page
+    while node is not None:
+        if key in node:
+            return node.raw_get(key)
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return None
+
+
+def _page_digest(page, memo=None):
+    # A page is its decoded content streams plus everything else it draws or shows:
+    # resources (fonts, images, forms and the resources nested in them), annotations
+    # with their appearance streams, and the page geometry. Identical pages hash the
+    # same wherever they sit in the file.
+    memo = {} if memo is None else memo
+    digest = hashlib.sha256()
+    contents = page.get("/Contents")
+    if contents is not None:
+        contents = contents.get_object()
+        # An array of content streams is drawn as their concatenation
+        streams = contents if isinstance(contents, ArrayObject) else [contents]
+        digest.update(hashlib.sha256(b"\n".join(_stream_data(stream) for stream in streams)).digest())
+
+    for key in _INHERITABLE:
+        value = _inherited(page, key)
+        digest.update(key.encode() + (_object_digest(value, memo) if value is not None else b""))
+    for key in sorted(page):
+        if key not in _BACK_REFERENCES and key != "/Contents" and key not in _INHERITABLE:
+            digest.update(key.encode() + _object_digest(page.raw_get(key), memo))
+    return digest.digest()
+
+
+def page_count(path):
+    return len(PdfReader(path).pages)
+
+
+def _page_digests_range(path, start, stop):
+    # Process pool entry point: digest pages [start, stop) of the PDF at path
+    pages, memo = PdfReader(path).pages, {}
+    return [_page_digest(pages[i], memo) for i in range(start, min(stop, len(pages)))]
+
+
+@timed("page_digests")
+def page_digests(path, pages=None, executor=None):
+    """
+    SHA-256 digest of every page of the PDF at path, or of the 0-based
+    `pages` only.
+
+    With an executor, large files are hashed in parallel runs of
+    PAGE_CHUNK_SIZE pages; each worker opens the file itself.
+    """
+    reader = PdfReader(path)
+    if pages is None:
+        pages = range(len(reader.pages))
+    pages = list(pages)
+
+    if executor is None or len(pages) <= PAGE_CHUNK_SIZE or os.path.getsize(path) < PARALLEL_MIN_BYTES:
+        # Resources shared between pages are hashed once
+        memo = {}
+        return [_page_digest(reader.pages[i], memo) for i in pages]
+
+    # Split the requested pages into contiguous runs
+    runs, start = [], pages[0]
+    for previous, current in zip(pages, pages[1:] + [None]):
+        if current != previous + 1 or previous - start + 1 == PAGE_CHUNK_SIZE:
+            runs.append((start, previous + 1))
+            start = current
+    futures = [executor.submit(_page_digests_range, path, run_start, run_stop) for run_start, run_stop in runs]
+    return [digest for future in futures for digest in future.result()]
+
+
+def document_leaves(file_digest, digests):
+    # Leaf 0 is the digest of the whole file, the others are the pages in order
+    return [leaf_hash(file_digest)] + [leaf_hash(digest) for digest in digests]
+
+
+def document_root(file_digest, digests):
+    """
+    Merkle root signed for a document: whole-file digest plus one leaf per page.
+    """
+    return merkle_root(document_leaves(file_digest, digests))
+
+
+def pack_digests(digests):
+    return b"".join(digests)
+
+
+def unpack_digests(packed):
+    packed = bytes(packed or b"")
+    return [packed[i:i + DIGEST_SIZE] for i in range(0, len(packed), DIGEST_SIZE)]
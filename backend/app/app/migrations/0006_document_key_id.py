@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_document_text_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='key_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app.blob_store import BlobStore
+
+
+def move_content_to_blob_store(apps, schema_editor):
+    Document = apps.get_model('app', 'Document')
+    store = BlobStore(settings.BLOB_STORE_ROOT)
+
+    for document in Document.objects.only('id', 'hash', 'content').iterator(chunk_size=100):
+        content = bytes(document.content or b'')
+        if not content:
+            continue
+
+        digest = hashlib.sha256(content).hexdigest()
+        store.put_bytes(content, digest)
+        if document.hash != digest:
+            Document.objects.filter(pk=document.pk).update(hash=digest)
+
+
+def restore_content_from_blob_store(apps, schema_editor):
+    Document = apps.get_model('app', 'Document')
+    store = BlobStore(settings.BLOB_STORE_ROOT)
+
+    for document in Document.objects.only('id', 'hash').iterator(chunk_size=100):
+        if document.hash and store.exists(document.hash):
+            Document.objects.filter(pk=document.pk).update(content=store.read(document.hash))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_document_key_id'),
+    ]
+
+    operations = [
+        # Give the column a default so it can be re-added to existing rows when migrating backwards
+        migrations.AlterField(
+            model_name='document',
+            name='content',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(move_content_to_blob_store, restore_content_from_blob_store),
+        migrations.RemoveField(
+            model_name='document',
+            name='content',
+        ),
+    ]
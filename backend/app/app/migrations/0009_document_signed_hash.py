@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:27
+
+import os
+
+from django.db import migrations, models
+
+from app.digital_signature import hash_file, load_public_key, verify_digest
+
+
+def backfill_signed_hash(apps, schema_editor):
+    # Digest the signed copies of existing documents so they can use hash-first verification.
+    # Only files that still match their signature are recorded; anything else keeps the full check.
+    Document = apps.get_model('app', 'Document')
+    documents = Document.objects.filter(signed_hash__isnull=True).only('id', 'pdf_file', 'signature', 'public_key')
+    for document in documents.iterator(chunk_size=100):
+        if not document.pdf_file or not os.path.exists(document.pdf_file.path):
+            continue
+
+        digest = hash_file(document.pdf_file.path)
+        if verify_digest(digest, bytes(document.signature), load_public_key(bytes(document.public_key))):
+            Document.objects.filter(pk=document.pk).update(signed_hash=digest.hex())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_signingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='signed_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_signed_hash, migrations.RunPython.noop),
+    ]
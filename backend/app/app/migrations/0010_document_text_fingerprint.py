@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_document_signed_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='text_fingerprint',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:05
+
+from django.db import migrations
+
+from app.search import drop_search_index, install_search_index
+
+
+def create_search_index(apps, schema_editor):
+    # Create the FTS5 table and its sync triggers (or the PostgreSQL GIN index) and index existing documents
+    install_search_index(schema_editor)
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("INSERT INTO app_document_fts(app_document_fts) VALUES ('rebuild')")
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_document_owner_and_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_document_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='merkle_root',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='page_hashes',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_document_page_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignatureBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField()),
+                ('signature', models.BinaryField()),
+                ('public_key', models.BinaryField()),
+                ('key_id', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='batch_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='batch_proof',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='signature_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='app.signaturebatch'),
+        ),
+    ]
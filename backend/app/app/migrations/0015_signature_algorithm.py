@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+from app.search import install_search_index
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # Adding a NOT NULL column rebuilds app_document on SQLite, which drops the FTS5 sync triggers.
+    # Existing rows keep their ids, so the index itself stays valid.
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_signature_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='signature_algorithm',
+            field=models.CharField(default='rsa-pss-sha256', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='signaturebatch',
+            name='signature_algorithm',
+            field=models.CharField(default='rsa-pss-sha256', max_length=32),
+        ),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
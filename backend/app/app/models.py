@@ -1,38 +1,136 @@
+from django.conf import settings
 from django.db import models
-import hashlib
-from .utils import extract_text_from_pdf  # Import from utils
+from .blob_store import blob_store
+from .digital_signature import RSA_PSS
+from .text_extraction import extract_pdf_text
+from .text_similarity import text_fingerprint
+from .verification_cache import verification_cache
+
+
+class DocumentQuerySet(models.QuerySet):
+    def metadata(self):
+        """
+        Skip the large text column when only document metadata is needed.
+        The signature batch, if any, is fetched in the same query.
+        """
+        return self.defer("text_content").select_related("signature_batch")
+
+
+class SignatureBatch(models.Model):
+    # One signature over the Merkle root of many documents signed together
+    root = models.CharField(max_length=64, unique=True)  # Root over leaf_hash(merkle_root) of every document in the batch
+    size = models.PositiveIntegerField()  # Number of documents (leaves)
+    signature = models.BinaryField()
+    signature_algorithm = models.CharField(max_length=32, default=RSA_PSS)
+    public_key = models.BinaryField()
+    key_id = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.root} ({self.size} documents)"
+
 
 class Document(models.Model):
     # Existing fields
     document_id = models.CharField(max_length=255, unique=True)
     document_name = models.CharField(max_length=255, blank=True, null=True)
-    content = models.BinaryField()  # Store document content (binary)
     text_content = models.TextField(blank=True, null=True)  # Store extracted text content for OCR verification
-    hash = models.CharField(max_length=64, blank=True, null=True)  # Store SHA-256 hash of content
-    signature = models.BinaryField()  # Digital signature
+    text_fingerprint = models.BinaryField(blank=True, null=True)  # MinHash of text_content, compared by OCR verification
+    hash = models.CharField(max_length=64, blank=True, null=True)  # SHA-256 of the original content, key into the blob store
+    signed_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the signed (QR-stamped) file
+    page_hashes = models.BinaryField(blank=True, null=True)  # SHA-256 of each page of the signed copy, concatenated
+    merkle_root = models.CharField(max_length=64, blank=True, null=True)  # Root over signed_hash and page_hashes; signed instead of signed_hash when set
+    signature = models.BinaryField()  # Digital signature; empty when signature_batch holds it
+    signature_algorithm = models.CharField(max_length=32, default=RSA_PSS)  # digital_signature.SIGNERS key; rows signed before it existed are RSA-PSS
+    signature_batch = models.ForeignKey(SignatureBatch, blank=True, null=True, on_delete=models.PROTECT, related_name="documents")  # Batch whose root signature covers this document
+    batch_index = models.PositiveIntegerField(blank=True, null=True)  # Leaf position of this document in the batch tree
+    batch_proof = models.BinaryField(blank=True, null=True)  # Inclusion proof: sibling hashes up to the batch root, concatenated
     public_key = models.BinaryField()  # Public key for verification
+    key_id = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # Fingerprint of the signing key
     pdf_file = models.FileField(upload_to='documents/', blank=True, null=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL, related_name="documents")  # User who signed it
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def save(self, *args, **kwargs):
-        if self.content:
-            self.hash = hashlib.sha256(self.content).hexdigest()
+    objects = DocumentQuerySet.as_manager()
 
-        # Save the model to store the file first
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            # Keyset pagination of list_documents, newest first, overall and per owner
+            models.Index(fields=["-created_at", "-id"], name="document_created_idx"),
+            models.Index(fields=["owner", "-created_at", "-id"], name="document_owner_created_idx"),
+            # Name prefix filter
+            models.Index(fields=["document_name"], name="document_name_idx"),
+        ]
 
-        # Now that the file is saved, extract text if it's a PDF
-        if self.pdf_file:
-            try:
-                extracted_text = ""
-                with open(self.pdf_file.path, 'rb') as pdf_file:
-                    extracted_text = extract_text_from_pdf(pdf_file)
+    @property
+    def content(self):
+        """
+        Original document bytes, read from the blob store only when requested.
+        """
+        return blob_store.read(self.hash) if self.hash else b""
+
+    def open_content(self):
+        return blob_store.open(self.hash)
 
-                # Store the extracted text in the database
-                self.text_content = extracted_text
-                super().save(update_fields=["text_content"])  # Update only the extracted text
+    def save(self, *args, **kwargs):
+        # Text is extracted once, when the document is created. Only fill it in here if the
+        # caller did not, so re-saves (e.g. a signature update) never re-run extraction.
+        needs_text = (
+            kwargs.get("update_fields") is None
+            and "text_content" not in self.get_deferred_fields()
+            and self.text_content is None
+            and self.hash
+            and self.pdf_file
+            and self.pdf_file.name.lower().endswith(".pdf")
+        )
+        if needs_text and blob_store.exists(self.hash):
+            try:
+                self.text_content = extract_pdf_text(self.hash)
             except Exception as e:
                 raise ValueError(f"Error extracting text from PDF: {str(e)}")
 
+        # Fingerprint the text once, alongside it, so OCR verification never rescans it
+        if (
+            kwargs.get("update_fields") is None
+            and not {"text_content", "text_fingerprint"} & self.get_deferred_fields()
+            and self.text_content is not None
+            and self.text_fingerprint is None
+        ):
+            self.text_fingerprint = text_fingerprint(self.text_content)
+
+        super().save(*args, **kwargs)
+
+        # The file or signature may have changed; drop any cached verification result
+        verification_cache.invalidate(self.document_id)
+
     def __str__(self):
         return self.document_name if self.document_name else self.document_id
+
+
+class SigningJob(models.Model):
+    # Lifecycle of an asynchronous signing job
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    job_id = models.CharField(max_length=36, unique=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    file_name = models.CharField(max_length=255)  # Original upload name
+    document_name = models.CharField(max_length=255, blank=True, null=True)
+    content_hash = models.CharField(max_length=64)  # Original content in the blob store
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL)
+    document = models.ForeignKey(Document, blank=True, null=True, on_delete=models.SET_NULL)  # Set once signed
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.job_id} ({self.status})"
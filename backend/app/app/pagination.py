@@ -0,0 +1,132 @@
+import base64
+import sys
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import make_aware, is_naive
+from rest_framework.response import Response
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over (created_at, id), newest first.
+
+    Each page is a range scan on the (created_at, id) index starting after
+    the last row of the previous page, so it costs the same at any depth and
+    never runs a COUNT(*).
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, created_at, pk):
+        position = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor.")
+
+    def page_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("-created_at", "-id")
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # The leading bound on created_at lets the index range scan start at the cursor;
+            # the OR alone cannot be turned into one and walks every earlier row
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+
+        # One extra row tells whether there is a next page without counting
+        return queryset[:page_size + 1], page_size
+
+    def set_page(self, rows, page_size, request):
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.request = request
+        return self.page
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Return the rows of the requested page; queryset should already be projected.
+        """
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.set_page(list(queryset), page_size, request)
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset() with an async query, for async views.
+        """
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset], page_size, request)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(last["created_at"], last["id"])
+        return self.request.build_absolute_uri(f"{self.request.path}?{params.urlencode()}")
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+def _parse_date_bound(value, end_of_day=False):
+    # Accept a date ("2024-05-01") or a full datetime
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = parse_datetime(f"{day.isoformat()}T23:59:59.999999" if end_of_day else f"{day.isoformat()}T00:00:00")
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def _name_prefix(prefix):
+    # A range on document_name is what document_name_idx can seek; LIKE is
+    # case-insensitive on SQLite and needs a pattern opclass on PostgreSQL, so
+    # it only rechecks the prefix under collations that order differently
+    condition = Q(document_name__gte=prefix, document_name__startswith=prefix)
+    if ord(prefix[-1]) < sys.maxunicode:
+        condition &= Q(document_name__lt=prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return condition
+
+
+def filter_documents(queryset, request):
+    """
+    Apply the optional list_documents filters: name (case-sensitive prefix), created_after,
+    created_before and owner (a user id, or "me").
+    """
+    params = request.query_params
+    if params.get("name"):
+        queryset = queryset.filter(_name_prefix(params["name"]))
+    if params.get("created_after"):
+        queryset = queryset.filter(created_at__gte=_parse_date_bound(params["created_after"]))
+    if params.get("created_before"):
+        queryset = queryset.filter(created_at__lte=_parse_date_bound(params["created_before"], end_of_day=True))
+    if params.get("owner"):
+        owner = params["owner"]
+        if owner == "me":
+            owner = request.user.pk
+        elif not owner.isdigit():
+            raise ValueError(f"Invalid owner: {owner}")
+        queryset = queryset.filter(owner_id=owner)
+    return queryset
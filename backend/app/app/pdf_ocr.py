@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import pypdfium2 as pdfium
+import pytesseract
+from django.conf import settings
+
+from .instrumentation import timed
+from .utils import NoTextLayerError, extract_text_from_pdf
+
+# PDF user space has 72 points per inch
+PDF_POINTS_PER_INCH = 72
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Process pool of Tesseract workers shared by OCR requests, created on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_OCR_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def ocr_pdf_page(pdf_path, page_index, dpi, lang, timeout, tesseract_cmd):
+    """
+    Process pool entry point: rasterise one page and run Tesseract over it.
+
+    Only the path crosses the process boundary; the page image is rendered
+    and discarded inside the worker.
+    """
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page = pdf[page_index]
+        image = page.render(scale=dpi / PDF_POINTS_PER_INCH, grayscale=True).to_pil()
+        page.close()
+    finally:
+        pdf.close()
+
+    try:
+        return pytesseract.image_to_string(image, lang=lang, timeout=timeout)
+    except pytesseract.TesseractError as e:
+        raise ValueError(f"OCR of page {page_index + 1} failed: {str(e)}")
+    except RuntimeError as e:
+        # pytesseract kills Tesseract and raises RuntimeError once the timeout expires
+        raise ValueError(f"OCR of page {page_index + 1} timed out after {timeout} seconds: {str(e)}")
+    except Exception as e:
+        # Some pytesseract errors cannot be unpickled in the parent, which would break the pool
+        raise ValueError(f"OCR of page {page_index + 1} failed: {str(e)}")
+
+
+def pdf_page_count(pdf_path):
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def iter_pdf_ocr(pdf_path, dpi=None, lang=None):
+    """
+    OCR every page of a PDF across the worker pool.
+
+    Yields (page number, text) in page order as soon as each page and all
+    pages before it are done. Pages still queued are cancelled if the
+    consumer stops early.
+    """
+    dpi = dpi or settings.PDF_OCR_DPI
+    lang = lang or settings.PDF_OCR_LANGUAGE
+    executor = get_executor()
+
+    futures = [
+        executor.submit(
+            ocr_pdf_page, pdf_path, index, dpi, lang,
+            settings.PDF_OCR_PAGE_TIMEOUT, pytesseract.pytesseract.tesseract_cmd,
+        )
+        for index in range(pdf_page_count(pdf_path))
+    ]
+    try:
+        for index, future in enumerate(futures):
+            yield index + 1, future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+@timed("ocr_pdf")
+def ocr_pdf(pdf_path, dpi=None, lang=None):
+    """
+    Return the OCR text of a whole PDF, pages joined in order.
+    """
+    text = "\n".join(page_text for _, page_text in iter_pdf_ocr(pdf_path, dpi, lang))
+    if not text.strip():
+        raise ValueError("No text could be extracted from the scanned PDF.")
+    return text
+
+
+def pdf_extraction_config():
+    """
+    Settings that change the text extract_pdf_text_or_ocr returns, for cache keys.
+    """
+    return {
+        "engine": "pypdf2+tesseract" if settings.PDF_OCR_FALLBACK else "pypdf2",
+        "dpi": settings.PDF_OCR_DPI,
+        "lang": settings.PDF_OCR_LANGUAGE,
+    }
+
+
+def extract_pdf_text_or_ocr(pdf_path):
+    """
+    Return the text layer of a PDF, falling back to page OCR for scans.
+    """
+    with open(pdf_path, "rb") as pdf_file:
+        try:
+            return extract_text_from_pdf(pdf_file)
+        except NoTextLayerError:
+            if not settings.PDF_OCR_FALLBACK:
+                raise
+    return ocr_pdf(pdf_path)
+
+
+@contextmanager
+def uploaded_pdf_path(uploaded_file):
+    """
+    Filesystem path of an uploaded PDF, for the worker processes to open.
+
+    Uploads spooled to disk are used in place; in-memory uploads are copied
+    to a temporary file for the duration of the block.
+    """
+    if hasattr(uploaded_file, "temporary_file_path"):
+        yield uploaded_file.temporary_file_path()
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, pdf_file)
+        pdf_file.flush()
+        yield pdf_file.name
@@ -1,29 +1,189 @@
 import qrcode
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
 from PyPDF2 import PdfWriter, PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
 from io import BytesIO
+import re
+import shutil
+import zlib
 
-def generate_qr_code(url, filename="verification_qr.png"):
-    qr = qrcode.make(url)
-    qr.save(filename)
-    return filename
+from .instrumentation import timed
 
+# Link printed under the QR code; scanning it opens the verify_document GET view
+VERIFICATION_URL = "http://localhost:8000/verify?id={document_id}"
+QR_LINK_LABEL = "Verify document:"
+
+# Placement of the stamp on the last page, in PDF points
+QR_X = 10  # Move to the left (adjust X position for left side)
+QR_Y = 50  # Y position stays the same for bottom placement
+QR_SIZE = 50  # Smaller QR code
+
+# Resource names used by the stamp inside the last page's resource dictionary
+STAMP_FONT = "/QRStampFont"
+STAMP_IMAGE = "/QRStampImage"
+
+# Reusable overlay template: the stamp is the same on every document except for
+# the QR image and the link, so only those are filled in per call.
+STAMP_CONTENT_TEMPLATE = (
+    "Q\n"
+    f"q {QR_SIZE} 0 0 {QR_SIZE} {QR_X} {QR_Y} cm {STAMP_IMAGE} Do Q\n"
+    f"BT {STAMP_FONT} 12 Tf {QR_X} {QR_Y - 15} Td ({{label}}) Tj ET\n"
+    f"BT {STAMP_FONT} 12 Tf {QR_X} {QR_Y - 30} Td ({{url}}) Tj ET\n"
+)
+STAMP_FONT_OBJECT = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+
+def verification_url(document_id):
+    return VERIFICATION_URL.format(document_id=document_id)
+
+def render_qr_code(url):
+    """
+    Render the QR code for a URL as an in-memory 1-bit PIL image.
+    """
+    return qrcode.make(url).get_image()
+
+@timed("embed_qr")
 def embed_qr_code_and_link(pdf_path, verification_url, output_pdf):
-    qr_filename = generate_qr_code(verification_url)
+    """
+    Stamp the QR code and verification link on the last page of the PDF.
+
+    Appends an incremental update (the new last page object, the stamp's
+    image, font and content streams, and a new xref section) after the
+    original bytes, so the cost no longer grows with the number of pages.
+    PDFs that cannot be updated incrementally are rewritten in full.
+    """
+    qr_image = render_qr_code(verification_url)
+    try:
+        _append_stamp(pdf_path, qr_image, verification_url, output_pdf)
+    except IncrementalUpdateUnsupported:
+        _stamp_last_page(pdf_path, qr_image, verification_url, output_pdf)
+
+
+class IncrementalUpdateUnsupported(Exception):
+    pass
+
+
+def _pdf_string(text):
+    # Escape a literal string for a content stream
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _stream_object(data, **entries):
+    header = " ".join(f"/{key} {value}" for key, value in entries.items())
+    return b"<< " + header.encode() + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+def _serialize(pdf_object):
+    buffer = BytesIO()
+    pdf_object.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
 
+def _find_startxref(pdf_file):
+    # The offset of the last cross-reference section is given at the end of the file
+    pdf_file.seek(0, 2)
+    size = pdf_file.tell()
+    pdf_file.seek(max(0, size - 1024))
+    match = re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", pdf_file.read())
+    if not match:
+        raise IncrementalUpdateUnsupported("startxref not found")
+
+    startxref = int(match.group(1))
+    pdf_file.seek(startxref)
+    if pdf_file.read(4) != b"xref":
+        # Cross-reference streams would need a stream-based update section
+        raise IncrementalUpdateUnsupported("cross-reference stream")
+    return startxref
+
+
+def _append_stamp(pdf_path, qr_image, verification_url, output_pdf):
+    with open(pdf_path, "rb") as pdf_file:
+        startxref = _find_startxref(pdf_file)
+        pdf_file.seek(0)
+        reader = PdfReader(pdf_file)
+        if reader.is_encrypted or "/XRefStm" in reader.trailer:
+            raise IncrementalUpdateUnsupported("encrypted or hybrid-reference PDF")
+
+        last_page = reader.pages[-1]
+        page_ref = last_page.indirect_reference
+        if page_ref is None:
+            raise IncrementalUpdateUnsupported("last page is not an indirect object")
+
+        # New objects are numbered after the existing ones
+        next_number = int(reader.trailer["/Size"])
+        font_number, image_number, open_number, stamp_number = range(next_number, next_number + 4)
+
+        # Wrap the original contents in q/Q so the stamp starts from a clean graphics state
+        contents = last_page.raw_get("/Contents") if "/Contents" in last_page else ArrayObject()
+        if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+            contents = contents.get_object()
+        original_contents = list(contents) if isinstance(contents, ArrayObject) else [contents]
+
+        new_page = DictionaryObject(last_page)
+        new_page[NameObject("/Contents")] = ArrayObject(
+            [IndirectObject(open_number, 0, reader)] + original_contents + [IndirectObject(stamp_number, 0, reader)]
+        )
+
+        # Add the stamp's font and image to a copy of the page resources
+        resources = DictionaryObject(last_page["/Resources"].get_object()) if "/Resources" in last_page else DictionaryObject()
+        for category, name, number in (("/Font", STAMP_FONT, font_number), ("/XObject", STAMP_IMAGE, image_number)):
+            entries = DictionaryObject(resources[category].get_object()) if category in resources else DictionaryObject()
+            entries[NameObject(name)] = IndirectObject(number, 0, reader)
+            resources[NameObject(category)] = entries
+        new_page[NameObject("/Resources")] = resources
+
+        # The new trailer chains back to the original cross-reference section
+        trailer = DictionaryObject()
+        trailer[NameObject("/Size")] = NumberObject(next_number + 4)
+        trailer[NameObject("/Prev")] = NumberObject(startxref)
+        for key in ("/Root", "/Info", "/ID"):
+            if key in reader.trailer:
+                trailer[NameObject(key)] = reader.trailer.raw_get(key)
+        trailer_bytes = _serialize(trailer)
+        page_bytes = _serialize(new_page)
+
+    qr_image = qr_image.convert("1")
+    stamp = STAMP_CONTENT_TEMPLATE.format(label=_pdf_string(QR_LINK_LABEL), url=_pdf_string(verification_url))
+    objects = [
+        ((font_number, 0), STAMP_FONT_OBJECT),
+        ((image_number, 0), _stream_object(
+            zlib.compress(qr_image.tobytes()),
+            Type="/XObject", Subtype="/Image", Width=qr_image.width, Height=qr_image.height,
+            ColorSpace="/DeviceGray", BitsPerComponent=1, Filter="/FlateDecode",
+        )),
+        ((open_number, 0), _stream_object(b"q\n")),
+        ((stamp_number, 0), _stream_object(stamp.encode("latin-1"))),
+        ((page_ref.idnum, page_ref.generation), page_bytes),
+    ]
+
+    if output_pdf != pdf_path:
+        shutil.copyfile(pdf_path, output_pdf)
+
+    with open(output_pdf, "ab") as f_out:
+        f_out.write(b"\n")
+        offsets = []
+        for (number, generation), body in objects:
+            offsets.append((number, generation, f_out.tell()))
+            f_out.write(b"%d %d obj\n" % (number, generation) + body + b"\nendobj\n")
+
+        # One xref subsection per updated object keeps the section valid for any numbering
+        xref_offset = f_out.tell()
+        f_out.write(b"xref\n0 1\n0000000000 65535 f \n")
+        for number, generation, offset in sorted(offsets):
+            f_out.write(b"%d 1\n%010d %05d n \n" % (number, offset, generation))
+        f_out.write(b"trailer\n" + trailer_bytes + b"\nstartxref\n%d\n%%%%EOF\n" % xref_offset)
+
+
+def _stamp_last_page(pdf_path, qr_image, verification_url, output_pdf):
     # Create a PDF overlay for QR code and text link, now positioned to the left
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=letter)
 
-    # Move QR code and link to the left
-    qr_x = 10  # Move to the left (adjust X position for left side)
-    qr_y = 50  # Y position stays the same for bottom placement
-
     # Draw QR code and text link
-    c.drawImage(qr_filename, qr_x, qr_y, width=50, height=50)  # Smaller QR code
-    c.drawString(qr_x, qr_y - 15, "Verify document:")  # Text above the link
-    c.drawString(qr_x, qr_y - 30, verification_url)  # Text link in smaller font
+    c.drawImage(ImageReader(qr_image.convert("RGB")), QR_X, QR_Y, width=QR_SIZE, height=QR_SIZE)
+    c.drawString(QR_X, QR_Y - 15, QR_LINK_LABEL)  # Text above the link
+    c.drawString(QR_X, QR_Y - 30, verification_url)  # Text link in smaller font
 
     c.save()
 
@@ -0,0 +1,204 @@
+"""
+Full-text search over document names and extracted text.
+
+SQLite uses an FTS5 index over app_document kept in sync by triggers, so rows
+written by save(), bulk_create() and update() alike are indexed in the same
+transaction. PostgreSQL uses a GIN index on the document tsvector. Other
+databases fall back to case-insensitive substring filters without an index.
+
+Migrations that rebuild app_document on SQLite (e.g. adding a NOT NULL column)
+drop its triggers; run `manage.py rebuild_search_index` or call
+install_search_index() again afterwards.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = "app_document_fts"
+
+# Highlight markers around matched terms in snippets
+SNIPPET_START = "<b>"
+SNIPPET_END = "</b>"
+SNIPPET_TOKENS = 16
+
+# Matches in the document name count ten times as much as matches in the text
+NAME_WEIGHT = 10.0
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        document_name, text_content,
+        content='app_document', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON app_document BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document_name, text_content)
+        VALUES (new.id, new.document_name, new.text_content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON app_document BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document_name, text_content)
+        VALUES ('delete', old.id, old.document_name, old.text_content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF document_name, text_content ON app_document BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document_name, text_content)
+        VALUES ('delete', old.id, old.document_name, old.text_content);
+        INSERT INTO {FTS_TABLE}(rowid, document_name, text_content)
+        VALUES (new.id, new.document_name, new.text_content);
+    END""",
+]
+
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# The query must use this exact expression for PostgreSQL to pick the index
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(document_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(text_content, '')), 'B')"
+)
+
+POSTGRES_SCHEMA = [
+    f"CREATE INDEX IF NOT EXISTS app_document_search_idx ON app_document USING GIN (({POSTGRES_VECTOR}))",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS app_document_search_idx",
+]
+
+
+def install_search_index(schema_editor=None):
+    """
+    Create the search index and its sync triggers if they are missing.
+    """
+    cursor_owner = schema_editor.connection if schema_editor else connection
+    if cursor_owner.vendor not in ("sqlite", "postgresql"):
+        return
+    statements = SQLITE_SCHEMA if cursor_owner.vendor == "sqlite" else POSTGRES_SCHEMA
+    with cursor_owner.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(schema_editor=None):
+    cursor_owner = schema_editor.connection if schema_editor else connection
+    if cursor_owner.vendor not in ("sqlite", "postgresql"):
+        return
+    statements = SQLITE_DROP if cursor_owner.vendor == "sqlite" else POSTGRES_DROP
+    with cursor_owner.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_search_index():
+    """
+    Reinstall the index and re-index every existing document.
+    """
+    install_search_index()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        elif connection.vendor == "postgresql":
+            cursor.execute("REINDEX INDEX app_document_search_idx")
+
+
+def _fts5_query(query):
+    # Quote every word so user input can never be parsed as FTS5 syntax; a
+    # trailing * still asks for a prefix match ("contr*")
+    words = re.findall(r"\w+\*?", query)
+    terms = []
+    for word in words:
+        prefix = word.endswith("*")
+        terms.append('"%s"%s' % (word.rstrip("*"), "*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _snippet(text, words):
+    # SNIPPET_TOKENS words of text around the first match, with every matched word highlighted
+    tokens = text.split()
+    lowered = [token.lower() for token in tokens]
+    first = next((i for i, token in enumerate(lowered) if any(word in token for word in words)), 0)
+    start = max(0, first - SNIPPET_TOKENS // 2)
+    window = tokens[start:start + SNIPPET_TOKENS]
+    highlighted = [
+        f"{SNIPPET_START}{token}{SNIPPET_END}" if any(word in token.lower() for word in words) else token
+        for token in window
+    ]
+    return ("..." if start else "") + " ".join(highlighted) + ("..." if start + SNIPPET_TOKENS < len(tokens) else "")
+
+
+def _search_without_index(query, limit, offset, owner_id):
+    # Other databases have no index here: every word must occur in the name or the
+    # text (case-insensitively), and name matches rank first as with the indexes
+    from django.db.models import Case, F, FloatField, Q, Value, When
+
+    from .models import Document
+
+    words = [word.lower() for word in re.findall(r"\w+", query)]
+    if not words:
+        return []
+    documents = Document.objects.all()
+    if owner_id:
+        documents = documents.filter(owner_id=owner_id)
+    score = Value(0.0)
+    for word in words:
+        documents = documents.filter(Q(document_name__icontains=word) | Q(text_content__icontains=word))
+        score = score + Case(When(document_name__icontains=word, then=Value(NAME_WEIGHT)), default=Value(1.0), output_field=FloatField())
+    rows = documents.annotate(score=score).order_by(F("score").desc(), "-id").values(
+        "id", "document_name", "text_content", "score"
+    )[offset:offset + limit]
+    return [
+        {"id": row["id"], "document_name": row["document_name"], "score": row["score"], "snippet": _snippet(row["text_content"] or "", words)}
+        for row in rows
+    ]
+
+
+def search_documents(query, limit=20, offset=0, owner_id=None):
+    """
+    Return [{"id", "document_name", "score", "snippet"}] for documents
+    matching every word of the query, best matches first.
+    """
+    if connection.vendor == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT d.id, d.document_name, -bm25({FTS_TABLE}, %s, 1.0) AS score,
+                   snippet({FTS_TABLE}, 1, %s, %s, '...', %s) AS snippet
+            FROM {FTS_TABLE}
+            JOIN app_document d ON d.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s {"AND d.owner_id = %s" if owner_id else ""}
+            ORDER BY bm25({FTS_TABLE}, %s, 1.0)
+            LIMIT %s OFFSET %s
+        """
+        params = [NAME_WEIGHT, SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS, match]
+    elif connection.vendor == "postgresql":
+        if not query.strip():
+            return []
+        sql = f"""
+            SELECT d.id, d.document_name, ts_rank(%s::real[], {POSTGRES_VECTOR}, q) AS score,
+                   ts_headline('english', coalesce(d.text_content, ''), q, %s) AS snippet
+            FROM app_document d, websearch_to_tsquery('english', %s) q
+            WHERE ({POSTGRES_VECTOR}) @@ q {"AND d.owner_id = %s" if owner_id else ""}
+            ORDER BY score DESC
+            LIMIT %s OFFSET %s
+        """
+        headline_options = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords={SNIPPET_TOKENS}, MinWords=5"
+        # Weights are given as {D, C, B, A}; the name is labelled A and the text B
+        weights = [1 / NAME_WEIGHT, 1 / NAME_WEIGHT, 1 / NAME_WEIGHT, 1.0]
+        params = [weights, headline_options, query]
+    else:
+        return _search_without_index(query, limit, offset, owner_id)
+
+    if owner_id:
+        params.append(owner_id)
+    if connection.vendor == "sqlite":
+        params.append(NAME_WEIGHT)
+    params += [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
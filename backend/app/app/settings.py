@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,12 +85,60 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE selects the backend: "sqlite" (the default, for single-node
+# deployments) or "postgresql". Connection details come from DATABASE_NAME,
+# DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and DATABASE_PORT.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'app'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            # Keep connections open across requests instead of reconnecting for each one,
+            # and check them before reuse so a restarted server is noticed
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    # DATABASE_POOL_SIZE uses a psycopg 3 connection pool (psycopg[pool]) instead of
+    # persistent connections; the two cannot be combined
+    if os.environ.get('DATABASE_POOL_SIZE'):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': 2,
+            'max_size': int(os.environ['DATABASE_POOL_SIZE']),
+            'timeout': 10,
+        }
+elif DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a write waits for the lock held by another connection before "database is locked"
+                'timeout': float(os.environ.get('SQLITE_TIMEOUT', 20)),
+                # Transactions take the write lock when they begin. A deferred transaction that reads
+                # first and then writes fails at once on contention, without waiting for the timeout.
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets readers run while a write is in progress; with it, NORMAL
+                # synchronisation only risks the last commits on power loss, not corruption
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY'
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DATABASE_ENGINE must be 'sqlite' or 'postgresql', not {DATABASE_ENGINE!r}.")
 
 
 # Password validation
@@ -133,6 +185,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
 
+# Spool uploads to disk and hash them in a single pass
+FILE_UPLOAD_HANDLERS = [
+    'app.uploads.HashingFileUploadHandler',
+]
+
 MEDIA_URL = '/media/'
 LOGIN_URL = '/login/'
 
@@ -141,4 +198,109 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
 }
+
+# Signing keys
+# "pool" signs every document with a fresh key taken from a pre-generated pool,
+# "shared" uses one long-lived key and "tenant" one long-lived key per user.
+SIGNING_KEY_MODE = 'pool'
+SIGNING_KEY_DIR = BASE_DIR / 'keys'
+KEY_POOL_SIZE = 8  # Number of pre-generated keys kept ready
+KEY_POOL_LOW_WATER = 2  # Refill the pool when it drops to this depth
+
+# Algorithm for new signatures: "rsa-pss-sha256", "ecdsa-p256-sha256" or "ed25519".
+# Every document records its own algorithm, so changing this keeps older documents verifiable.
+SIGNATURE_ALGORITHM = 'rsa-pss-sha256'
+
+# Content-addressed store for original document bytes, keyed by SHA-256
+BLOB_STORE_ROOT = BASE_DIR / 'blobs'
+
+# Number of extracted PDF texts kept in memory per process, keyed by content hash
+TEXT_EXTRACTION_CACHE_SIZE = 256
+
+# OCR of scanned PDFs: pages are rasterised and read by a pool of Tesseract processes
+PDF_OCR_FALLBACK = True  # OCR PDFs that have no text layer instead of rejecting them
+PDF_OCR_WORKERS = None  # Worker processes; None uses every core
+PDF_OCR_DPI = 300  # Rasterisation resolution
+PDF_OCR_LANGUAGE = 'eng'  # Tesseract language
+PDF_OCR_PAGE_TIMEOUT = 60  # Seconds before Tesseract is stopped on a single page
+
+# Preprocessing applied to images before OCR, in this order; requests may pick a subset
+# with preprocess=<comma-separated stages> (or preprocess=none)
+OCR_PREPROCESSING_STAGES = ['grayscale', 'downscale', 'denoise', 'deskew', 'threshold']
+OCR_TARGET_DPI = 300  # Larger photos are downscaled to this resolution
+
+# On-disk cache of extracted/OCRed text, keyed by SHA-256 of the input and the extractor settings.
+# Least recently used entries are evicted beyond MAX_BYTES. Send no_cache=true to bypass it per request.
+EXTRACTION_CACHE = {
+    'ENABLED': True,
+    'LOCATION': BASE_DIR / 'extraction_cache',
+    'MAX_BYTES': 256 * 1024 * 1024,
+}
+
+# Downloads of signed copies. DOWNLOAD_SENDFILE hands the transfer to the front proxy:
+# None streams from Django, "x-sendfile" (Apache/lighttpd) or "x-accel-redirect" (nginx,
+# with an internal location at DOWNLOAD_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT).
+DOWNLOAD_SENDFILE = None
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = '/protected/'
+DOWNLOAD_EXPORT_MAX_DOCUMENTS = 500  # Documents per zip export
+
+# Asynchronous signing jobs (create_signed_document with async=true)
+SIGNING_JOB_WORKERS = 2  # In-process worker threads; 0 leaves the queue to `manage.py run_signing_workers`
+SIGNING_JOB_POLL_INTERVAL = 1.0  # Seconds between queue polls when idle
+# Seconds a running job may go without finishing before another worker takes it over,
+# e.g. after its worker crashed. Must be well above the time a single document takes.
+SIGNING_JOB_LEASE = 600
+# Start the in-process workers when the app loads, so jobs queued before a restart are drained
+# without waiting for the next upload. Set in the web server's environment only, so tests and
+# management commands never run workers.
+SIGNING_JOB_AUTOSTART = os.environ.get('SIGNING_JOB_AUTOSTART', '') == '1'
+
+# Batch signing (create_signed_documents_batch)
+BATCH_SIGNING_WORKERS = None  # Worker processes; None uses every core
+BATCH_SIGNING_MAX_FILES = 1000  # Documents accepted per batch
+BATCH_INSERT_SIZE = 100  # Rows per bulk INSERT
+
+# Merkle-batched signing: documents signed together share one signature over the Merkle
+# root of their digests, and each stores its inclusion proof. Batch uploads sign every
+# group of documents finishing within SIGNATURE_BATCH_WINDOW together; single uploads
+# wait up to SIGNATURE_BATCH_WINDOW for others to share a signature with.
+SIGNATURE_BATCHING = False
+SIGNATURE_BATCH_WINDOW = 0.05  # Seconds
+SIGNATURE_BATCH_MAX_SIZE = 256  # Single uploads per batch
+SIGNATURE_BATCH_ROOT_CACHE_SIZE = 10000  # Verified batch roots remembered per process
+
+# Pipeline instrumentation: per-stage latency histograms served at metrics/ in Prometheus
+# text format, and a Server-Timing header breaking down every response. When disabled,
+# each instrumented stage costs a single function call.
+METRICS_ENABLED = False
+SERVER_TIMING_HEADER = True  # Only while METRICS_ENABLED
+METRICS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]  # Seconds
+
+# Async views for the I/O-bound endpoints (QR-scan verification, download and listing):
+# async ORM queries and file reads, with hashing and signature checks on a thread pool.
+# Only worthwhile when served over ASGI (asgi.py); under WSGI each request would pay
+# for an event loop.
+ASYNC_VIEWS = False
+
+# Batch verification (verify_batch)
+BATCH_VERIFICATION_WORKERS = 8  # Threads checking signatures in parallel
+BATCH_VERIFICATION_MAX_ITEMS = 10000  # Documents accepted per request
+
+# Cache of QR-scan verification results (verify_document GET).
+# BACKEND is "locmem" (per-process LRU), "file" (shared directory) or "django" (CACHES alias).
+VERIFICATION_CACHE = {
+    'BACKEND': 'locmem',
+    'MAX_ENTRIES': 10000,
+    'LOCATION': BASE_DIR / 'verification_cache',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+}
+VERIFICATION_CACHE_MAX_AGE = 300  # Cache-Control max-age of the verification page, in seconds
+
+# OCR verification compares MinHash fingerprints of word shingles instead of raw text.
+# Fingerprints are stored at sign time; after changing OCR_SHINGLE_SIZE clear
+# Document.text_fingerprint so they are recomputed on the next verification.
+OCR_SIMILARITY_THRESHOLD = 0.7  # Minimum estimated Jaccard similarity for a match
+OCR_SHINGLE_SIZE = 2  # Words per shingle
+OCR_MINHASH_PERMUTATIONS = 128  # Fingerprint length; more is more precise
 # settings.py
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Merkle-batched signing.
+
+Documents signed together become the leaves of a Merkle tree (one leaf per
+document root), a single private-key operation signs the tree's root, and
+every document keeps its leaf index and inclusion proof. Verifying a
+document recomputes the batch root from its proof; the root signature itself
+is checked once per process and remembered.
+"""
+import hashlib
+import hmac
+import threading
+
+from django.conf import settings
+
+from .digital_signature import key_algorithm, load_public_key, sign_digest, verify_digest
+from .key_pool import get_signing_key, public_key_pem
+from .merkle import inclusion_proofs, leaf_hash, merkle_root, pack_digests, root_from_proof, unpack_digests
+from .models import SignatureBatch
+from .verification_cache import LocMemBackend
+
+_root_results = LocMemBackend({"MAX_ENTRIES": settings.SIGNATURE_BATCH_ROOT_CACHE_SIZE})
+
+
+def sign_messages(messages, tenant=None):
+    """
+    Sign many 32-byte messages with one signature over their Merkle root.
+
+    Returns (saved SignatureBatch, [packed inclusion proof per message]).
+    """
+    leaves = [leaf_hash(message) for message in messages]
+    root = merkle_root(leaves)
+    private_key, key_id = get_signing_key(tenant=tenant)
+    batch = SignatureBatch.objects.create(
+        root=root.hex(),
+        size=len(leaves),
+        signature=sign_digest(root, private_key),
+        signature_algorithm=key_algorithm(private_key),
+        public_key=public_key_pem(private_key),
+        key_id=key_id,
+    )
+    return batch, [pack_digests(proof) for proof in inclusion_proofs(leaves)]
+
+
+def attach_batch(document, batch, index, proof):
+    # The document's own signature stays empty; the batch holds it
+    document.signature = b""
+    document.signature_batch = batch
+    document.batch_index = index
+    document.batch_proof = proof
+    document.signature_algorithm = batch.signature_algorithm
+    document.public_key = batch.public_key
+    document.key_id = batch.key_id
+
+
+def sign_documents(documents, tenant=None):
+    """
+    Sign unsaved documents (with merkle_root set) as one batch.
+    """
+    batch, proofs = sign_messages([bytes.fromhex(document.merkle_root) for document in documents], tenant=tenant)
+    for index, (document, proof) in enumerate(zip(documents, proofs)):
+        attach_batch(document, batch, index, proof)
+    return batch
+
+
+class _OpenBatch:
+    def __init__(self):
+        self.messages = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchSigner:
+    """
+    Groups the signatures requested by concurrent callers.
+
+    The first caller of a window becomes its leader: it waits up to `window`
+    seconds (less once `max_size` messages have joined), signs the root of
+    everything collected, and hands each caller its inclusion proof. Callers
+    for different tenants are never batched together.
+    """
+
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._open = {}
+        self.batches = 0
+        self.signed = 0
+
+    def _close(self, tenant, batch):
+        # Called with the lock held; later callers start a new batch
+        if self._open.get(tenant) is batch:
+            del self._open[tenant]
+
+    def sign(self, message, tenant=None):
+        """
+        Return (SignatureBatch, leaf index, packed inclusion proof) for a 32-byte message.
+        """
+        with self._lock:
+            batch = self._open.get(tenant)
+            leader = batch is None
+            if leader:
+                batch = self._open[tenant] = _OpenBatch()
+            index = len(batch.messages)
+            batch.messages.append(message)
+            if len(batch.messages) >= self.max_size:
+                self._close(tenant, batch)
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                self._close(tenant, batch)
+            try:
+                batch.result = sign_messages(batch.messages, tenant=tenant)
+                with self._lock:
+                    self.batches += 1
+                    self.signed += len(batch.messages)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        signature_batch, proofs = batch.result
+        return signature_batch, index, proofs[index]
+
+    def stats(self):
+        with self._lock:
+            return {"batches": self.batches, "signed": self.signed, "window": self.window, "max_size": self.max_size}
+
+
+batch_signer = BatchSigner(settings.SIGNATURE_BATCH_WINDOW, settings.SIGNATURE_BATCH_MAX_SIZE)
+
+
+def verify_batch_root(batch):
+    """
+    Check the signature over a batch root, once per process for every batch.
+    """
+    key = "%s:%s:%s" % (batch.root, batch.signature_algorithm, hashlib.sha256(bytes(batch.signature) + bytes(batch.public_key)).hexdigest())
+    verified = _root_results.get(key)
+    if verified is None:
+        verified = verify_digest(
+            bytes.fromhex(batch.root), bytes(batch.signature), load_public_key(bytes(batch.public_key)), batch.signature_algorithm
+        )
+        _root_results.set(key, verified)
+    return verified
+
+
+def verify_inclusion(document, message):
+    """
+    Verify that the document's batch root covers `message` (its Merkle root)
+    and that the root is signed.
+    """
+    batch = document.signature_batch
+    try:
+        root = root_from_proof(leaf_hash(message), document.batch_index, batch.size, unpack_digests(document.batch_proof))
+    except ValueError:
+        return False
+    if not hmac.compare_digest(root.hex(), batch.root):
+        return False
+    return verify_batch_root(batch)
@@ -0,0 +1,103 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .blob_store import blob_store
+from .digital_signature import key_algorithm, sign_digest
+from .instrumentation import span
+from .key_pool import get_signing_key, public_key_pem
+from .merkle import document_root, pack_digests
+from .models import Document
+from .qr_code import verification_url
+from .signature_batches import attach_batch, batch_signer
+from .signing_worker import stamp_and_hash
+from .text_extraction import extract_pdf_text
+from .uploads import uploaded_file_digest
+
+
+def store_upload(uploaded_file):
+    """
+    Move an uploaded file into the blob store and return its content hash.
+    """
+    # SHA-256 of the document content, computed while the upload was spooled to disk
+    document_hash = uploaded_file_digest(uploaded_file)
+
+    # Move the original into the content-addressed blob store; identical re-uploads are already there
+    blob_store.put_upload(uploaded_file, document_hash)
+    return document_hash
+
+
+def reserve_signed_copy(file_name):
+    """
+    Reserve a unique name under documents/ for a signed copy.
+
+    Returns (storage name, filesystem path). The empty placeholder is created
+    exclusively, so concurrent uploads with the same name never collide.
+    """
+    pdf_field = Document._meta.get_field("pdf_file")
+    pdf_name = pdf_field.storage.save(pdf_field.generate_filename(None, file_name), ContentFile(b""))
+    return pdf_name, pdf_field.storage.path(pdf_name)
+
+
+def sign_stored_document(document_hash, file_name, document_name=None, tenant=None, owner_id=None, save=True):
+    """
+    Run the signing pipeline for an original already in the blob store:
+    text extraction, QR embedding and signing of the stamped copy.
+
+    Returns the Document, inserted with a single INSERT unless `save` is
+    False (for callers that save it in a transaction of their own). Raises
+    ValueError for unprocessable PDFs.
+    """
+    blob_path = blob_store.path(document_hash)
+
+    # Extract text if it's a PDF (optional step for OCR verification), once per content hash
+    extracted_text = ""
+    if file_name.lower().endswith(".pdf"):
+        try:
+            extracted_text = extract_pdf_text(document_hash, blob_path)
+        except Exception as e:
+            raise ValueError(f"Error extracting text from PDF: {str(e)}")
+
+    # Generate a unique document ID
+    document_id = str(uuid.uuid4())
+
+    # Reserve a file name for the signed copy under documents/
+    pdf_name, document_path = reserve_signed_copy(file_name)
+
+    # Generate a verification URL with a QR code
+    document_url = verification_url(document_id)
+
+    document = Document(
+        document_id=document_id,
+        document_name=document_name,
+        hash=document_hash,  # Save the hash, which also locates the original in the blob store
+        pdf_file=pdf_name,
+        owner_id=owner_id,
+        text_content=extracted_text  # Save the extracted text for later OCR verification
+    )
+
+    # Embed the QR code and hash the stamped copy
+    signed_digest, page_digests = stamp_and_hash(blob_path, document_path, document_url)
+    document.signed_hash = signed_digest.hex()  # Digest of the signed copy, for hash-first verification
+    document.page_hashes = pack_digests(page_digests)  # Per-page digests, to locate tampering
+    root = document_root(signed_digest, page_digests)
+    document.merkle_root = root.hex()  # What the signature covers
+
+    if settings.SIGNATURE_BATCHING:
+        # Share one signature with the documents signed within the same window
+        with span("batch_sign"):
+            attach_batch(document, *batch_signer.sign(root, tenant=tenant))
+    else:
+        # Take a signing key from the key pool (or the long-lived key, depending on SIGNING_KEY_MODE)
+        private_key, key_id = get_signing_key(tenant=tenant)
+        document.signature = sign_digest(root, private_key)
+        document.signature_algorithm = key_algorithm(private_key)
+        document.public_key = public_key_pem(private_key)
+        document.key_id = key_id
+
+    # Save the document in the database
+    if save:
+        with span("db_save"):
+            document.save()
+    return document
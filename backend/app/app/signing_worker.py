@@ -0,0 +1,66 @@
+"""
+CPU-bound steps of the signing pipeline.
+
+Nothing in this module touches Django, so the functions can run in freshly
+spawned worker processes as well as in the request thread.
+"""
+from cryptography.hazmat.primitives import serialization
+
+from .digital_signature import sign_digest, hash_file
+from .merkle import document_root, page_digests
+from .qr_code import embed_qr_code_and_link
+from .utils import NoTextLayerError, extract_text_from_pdf
+
+
+def stamp_and_hash(original_path, output_path, document_url):
+    """
+    Write the QR-stamped copy of the original to output_path.
+
+    Returns (signed_digest, page_digests) of the stamped copy.
+    """
+    # Embed QR code and verification link, writing the signed copy from the stored original
+    embed_qr_code_and_link(original_path, document_url, output_path)
+
+    # Hash the document with the QR embedded in chunks, and each of its pages
+    return hash_file(output_path), page_digests(output_path)
+
+
+def stamp_and_sign(original_path, output_path, document_url, private_key):
+    """
+    Write the QR-stamped copy of the original to output_path and sign it.
+
+    Returns (signature, signed_digest, page_digests). The signature covers the
+    Merkle root over the file digest and the page digests.
+    """
+    signed_digest, digests = stamp_and_hash(original_path, output_path, document_url)
+
+    # Sign the root over those digests, ensuring the copy is signed and tamper-proof
+    return sign_digest(document_root(signed_digest, digests), private_key), signed_digest, digests
+
+
+def sign_in_worker(original_path, output_path, document_url, private_key_der, extract_text):
+    """
+    Process pool entry point: optionally extract the text, then stamp and sign.
+
+    The private key travels as DER bytes since key objects cannot be pickled.
+    Without a key the copy is only stamped and hashed, and "signature" is None.
+    """
+
+    text = None
+    needs_ocr = False
+    if extract_text:
+        with open(original_path, "rb") as original_file:
+            try:
+                text = extract_text_from_pdf(original_file)
+            except NoTextLayerError:
+                # Scans are left to the OCR pool of the parent process
+                needs_ocr = True
+
+    if private_key_der is None:
+        # Merkle-batched signing: the parent signs many documents at once
+        signature = None
+        signed_digest, digests = stamp_and_hash(original_path, output_path, document_url)
+    else:
+        private_key = serialization.load_der_private_key(private_key_der, password=None)
+        signature, signed_digest, digests = stamp_and_sign(original_path, output_path, document_url, private_key)
+    return {"signature": signature, "signed_digest": signed_digest, "page_digests": digests, "text": text, "needs_ocr": needs_ocr}
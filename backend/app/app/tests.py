@@ -1,15 +1,53 @@
+import json
 import time
-from django.test import TestCase, Client
+from django.test import TestCase, Client, LiveServerTestCase
 from django.urls import reverse
 from reportlab.pdfgen import canvas
 from io import BytesIO
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-class PerformanceTestCase(TestCase):
+class TemporaryStorageMixin:
+    # Keep signed copies and blobs written by a test out of the working tree
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from django.test import override_settings
+
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.storage_dir.cleanup)
+        storage_settings = override_settings(
+            MEDIA_ROOT=self.storage_dir.name,
+            BLOB_STORE_ROOT=f"{self.storage_dir.name}/blobs",
+            EXTRACTION_CACHE={
+                "ENABLED": True,
+                "LOCATION": f"{self.storage_dir.name}/extraction_cache",
+                "MAX_BYTES": 1024 * 1024,
+            },
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+def generate_pdf(text="Signed document", pages=1):
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    for page in range(pages):
+        c.drawString(100, 750, f"{text} page {page + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+class PerformanceTestCase(TemporaryStorageMixin, TestCase):
     # The setUp method is called before each test method is executed
     def setUp(self):
-        # Initialize the test client and the URL for the document upload endpoint
-        self.client = Client()
+        super().setUp()
+        from django.contrib.auth.models import User
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        # Initialize a test client authenticated like the frontend, with a JWT access token
+        user = User.objects.create_user("performance", password="secret")
+        self.client = Client(headers={"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"})
         self.upload_url = reverse('create_signed_document')
 
     # Helper method to generate a valid PDF document
@@ -25,25 +63,1045 @@ class PerformanceTestCase(TestCase):
         return SimpleUploadedFile(filename, buffer.read(), content_type='application/pdf')
         # Return the generated PDF as an uploaded file (SimpleUploadedFile)
 
-    # Test method to measure the performance of document upload
+    # Test method to measure the performance of document upload and verification
     def test_performance(self):
+        from .models import Document
+
         # Generate a large sample PDF file to test performance
         large_document = self.generate_valid_pdf('large_sample.pdf')
 
-        # Record the start time before making the request
-        start_time = time.time()
-        # Send the POST request to upload the document
+        # Time the upload with a monotonic, high-resolution clock
+        start_time = time.perf_counter()
         response = self.client.post(self.upload_url, {'document': large_document}, format='multipart')
-        # Record the end time after receiving the response
-        end_time = time.time()
-
-        # Print the response status code and content for debugging purposes
-        print(response.status_code, response.content.decode())  # Debugging step
-
-        # Calculate the time it took to process the request
-        processing_time = end_time - start_time
+        processing_time = time.perf_counter() - start_time
 
         # Assert that the response status code is 200 (success)
-        self.assertEqual(response.status_code, 200, "Upload failed with response code not 200")
+        self.assertEqual(response.status_code, 200, f"Upload failed: {response.status_code} {response.content.decode()}")
         # Assert that the processing time does not exceed 15 seconds
         self.assertLess(processing_time, 15, f"Processing time exceeded: {processing_time} seconds")
+
+        # Verify the signed copy, including the signature check
+        document = Document.objects.get(document_id=response.json()["document_id"])
+        with open(document.pdf_file.path, "rb") as f:
+            signed_copy = SimpleUploadedFile("large_sample.pdf", f.read(), content_type="application/pdf")
+        start_time = time.perf_counter()
+        response = self.client.post(reverse("verify_document"), {"id": document.document_id, "document": signed_copy, "full": "true"})
+        processing_time = time.perf_counter() - start_time
+        self.assertTrue(response.json()["verified"])
+        self.assertLess(processing_time, 15, f"Verification time exceeded: {processing_time} seconds")
+
+    # The benchmark suite (manage.py run_benchmarks) reports every stage and flags regressions
+    def test_microbenchmarks_and_comparison(self):
+        from .benchmarks import compare_results, generate_pdf as generate_corpus_pdf, run_microbenchmarks
+
+        results = run_microbenchmarks({"pdf": {"pdf-1p": generate_corpus_pdf(1)}, "image": {}}, repeat=1)
+        for stage in ("sign_document", "verify_signature", "extract_text_from_pdf", "embed_qr_code_and_link"):
+            self.assertGreater(results[f"micro.{stage}.pdf-1p"]["median_ms"], 0)
+
+        baseline = {"results": {"micro.sign": {"median_ms": 10.0}, "e2e.sign.c4": {"median_ms": 50.0, "throughput_rps": 40.0}}}
+        current = {"results": {"micro.sign": {"median_ms": 13.0}, "e2e.sign.c4": {"median_ms": 80.0, "throughput_rps": 36.0}}}
+        comparisons = {comparison["name"]: comparison for comparison in compare_results(baseline, current, threshold=0.2)}
+        self.assertTrue(comparisons["micro.sign"]["regression"])
+        # End-to-end runs are judged on throughput, which only dropped by 10%
+        self.assertEqual(comparisons["e2e.sign.c4"]["metric"], "throughput_rps")
+        self.assertFalse(comparisons["e2e.sign.c4"]["regression"])
+
+
+class KeyPoolTestCase(TestCase):
+    # The pool should serve pre-generated keys and count inline generations as misses
+    def test_filled_pool_serves_hits(self):
+        from .key_pool import KeyPool
+        pool = KeyPool(size=2, low_water=1, key_factory=object)
+
+        # Cold pool: the first acquire may race the refill worker, so wait for it to fill
+        pool.start()
+        deadline = time.time() + 5
+        while pool.stats()["depth"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        pool.acquire()
+        pool.acquire()
+        stats = pool.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["capacity"], 2)
+        self.assertGreaterEqual(stats["generated"], 2)
+
+    # Once the pool is drained, get_signing_key generates inline and counts a miss
+    def test_drained_pool_counts_misses(self):
+        import threading
+        from unittest import mock
+        from django.test import override_settings
+        from .digital_signature import RSA_PSS
+        from . import key_pool as key_pool_module
+
+        # The refill worker stalls after filling the pool once, so draining it stays drained
+        key = key_pool_module.generate_rsa_key()
+        refill_allowed = threading.Event()
+        self.addCleanup(refill_allowed.set)
+
+        def key_factory():
+            if threading.current_thread().name == "key-pool-refill" and pool.stats()["generated"] >= 2:
+                refill_allowed.wait()
+            return key
+
+        pool = key_pool_module.KeyPool(size=2, low_water=1, key_factory=key_factory)
+        pool.start()
+        deadline = time.time() + 5
+        while pool.stats()["depth"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with mock.patch.object(key_pool_module, "key_pool", pool), override_settings(SIGNING_KEY_MODE="pool"):
+            key_pool_module.get_signing_key(algorithm=RSA_PSS)
+            key_pool_module.get_signing_key(algorithm=RSA_PSS)
+            self.assertEqual(pool.stats()["misses"], 0)
+            private_key, key_id = key_pool_module.get_signing_key(algorithm=RSA_PSS)
+
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["depth"]), (2, 1, 0))
+        self.assertIs(private_key, key)
+
+
+class DigestSigningTestCase(TestCase):
+    # Signing a precomputed digest must stay interchangeable with signing the full content
+    def test_sign_digest_matches_sign_document(self):
+        import hashlib
+        from .key_pool import generate_rsa_key
+        from .digital_signature import sign_digest, sign_document, verify_digest, verify_signature
+
+        private_key = generate_rsa_key()
+        content = b"document content" * 1000
+        digest = hashlib.sha256(content).digest()
+
+        self.assertTrue(verify_signature(content, sign_digest(digest, private_key), private_key.public_key()))
+        self.assertTrue(verify_digest(digest, sign_document(content, private_key), private_key.public_key()))
+
+    # Uploads are hashed by the upload handler while they are spooled to disk
+    def test_upload_handler_hashes_upload(self):
+        import hashlib
+        from django.test import RequestFactory
+        from .uploads import uploaded_file_digest
+
+        content = b"%PDF-1.4 test" * 5000
+        request = RequestFactory().post("/", {"document": SimpleUploadedFile("a.pdf", content)})
+        uploaded_file = request.FILES["document"]
+
+        self.assertEqual(uploaded_file.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(uploaded_file_digest(uploaded_file), uploaded_file.sha256)
+
+
+class BlobStoreTestCase(TestCase):
+    # Identical content is stored once, under a sharded path derived from its digest
+    def test_content_addressed_deduplication(self):
+        import hashlib
+        import os
+        import tempfile
+        from .blob_store import BlobStore
+
+        with tempfile.TemporaryDirectory() as root:
+            store = BlobStore(root)
+            content = b"original document bytes"
+            digest = hashlib.sha256(content).hexdigest()
+
+            self.assertTrue(store.put_upload(SimpleUploadedFile("a.pdf", content), digest))
+            self.assertFalse(store.put_upload(SimpleUploadedFile("b.pdf", content), digest))
+
+            self.assertEqual(store.path(digest), os.path.join(root, digest[:2], digest[2:4], digest))
+            self.assertEqual(store.read(digest), content)
+
+
+class TextExtractionTestCase(TestCase):
+    # Text for a known content hash is reused, and re-saving a document never re-extracts
+    def test_extract_once_per_hash(self):
+        from unittest import mock
+        from .models import Document
+        from .text_extraction import extract_pdf_text
+
+        document = Document.objects.create(
+            document_id="doc-1", hash="ab" * 32, text_content="stored text",
+            signature=b"sig", public_key=b"key", pdf_file="documents/doc-1.pdf",
+        )
+
+        with mock.patch("app.text_extraction.extract_pdf_text_or_ocr") as extractor:
+            self.assertEqual(extract_pdf_text("ab" * 32), "stored text")
+            document.signature = b"new signature"
+            document.save()
+            extractor.assert_not_called()
+
+
+class SigningJobTestCase(TemporaryStorageMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .jobs import worker_pool
+
+        # Run jobs explicitly in the test thread instead of on the worker pool
+        patcher = mock.patch.object(worker_pool, "size", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("signer", password="secret"))
+
+    # An async upload returns a job ID at once and the result is available once a worker ran it
+    def test_async_signing_job(self):
+        from .jobs import process_pending_jobs
+
+        upload = SimpleUploadedFile("report.pdf", generate_pdf(), content_type="application/pdf")
+        response = self.client.post(reverse("create_signed_document"), {"document": upload, "async": "true"}, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+
+        self.assertEqual(self.client.get(reverse("signing_job_status", args=[job_id])).json()["status"], "pending")
+        self.assertEqual(self.client.get(reverse("signing_job_result", args=[job_id])).status_code, 202)
+
+        self.assertEqual(process_pending_jobs(), 1)
+        result = self.client.get(reverse("signing_job_result", args=[job_id]))
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(result.json()["document_id"])
+
+    # A job left running by a crashed worker is taken over once its lease expires
+    def test_stale_running_job_is_reclaimed(self):
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        from .jobs import process_pending_jobs
+        from .models import SigningJob
+
+        upload = SimpleUploadedFile("report.pdf", generate_pdf(), content_type="application/pdf")
+        job_id = self.client.post(reverse("create_signed_document"), {"document": upload, "async": "true"}, format="multipart").json()["job_id"]
+
+        SigningJob.objects.filter(job_id=job_id).update(status=SigningJob.RUNNING, started_at=timezone.now())
+        self.assertEqual(process_pending_jobs(), 0)
+
+        expired = timezone.now() - timedelta(seconds=settings.SIGNING_JOB_LEASE + 1)
+        SigningJob.objects.filter(job_id=job_id).update(started_at=expired)
+        self.assertEqual(process_pending_jobs(), 1)
+        self.assertEqual(SigningJob.objects.get(job_id=job_id).status, SigningJob.SUCCEEDED)
+
+
+class BatchSigningTestCase(TemporaryStorageMixin, TestCase):
+    # Every document in a batch is reported on its own line and saved
+    def test_batch_signing_streams_results(self):
+        import json
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("batch", password="secret"))
+        uploads = [
+            SimpleUploadedFile(f"certificate-{i}.pdf", generate_pdf(f"Certificate {i}"), content_type="application/pdf")
+            for i in range(3)
+        ]
+
+        response = client.post(reverse("create_signed_documents_batch"), {"documents": uploads}, format="multipart")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(lines[-1], {"signed": 3, "failed": 0})
+        document_ids = [line["document_id"] for line in lines[:-1]]
+        self.assertEqual(Document.objects.filter(document_id__in=document_ids).count(), 3)
+        # The batch takes a single key from the pool
+        self.assertEqual(Document.objects.filter(document_id__in=document_ids).values("public_key").distinct().count(), 1)
+
+    # A failure mid-stream ends with an error line and leaves no signed copies behind
+    def test_batch_failure_reports_error_and_cleans_up(self):
+        import json
+        import os
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("batch", password="secret"))
+        uploads = [
+            SimpleUploadedFile(f"certificate-{i}.pdf", generate_pdf(f"Certificate {i}"), content_type="application/pdf")
+            for i in range(3)
+        ]
+
+        with mock.patch.object(Document.objects, "bulk_create", side_effect=RuntimeError("database is gone")):
+            response = client.post(reverse("create_signed_documents_batch"), {"documents": uploads}, format="multipart")
+            lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(lines, [{"error": "Batch signing failed: database is gone"}])
+        self.assertFalse(Document.objects.exists())
+        # Copies still being written by a worker are deleted once it finishes
+        documents_dir = os.path.join(self.storage_dir.name, "documents")
+        deadline = time.monotonic() + 30
+        while os.listdir(documents_dir) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(os.listdir(documents_dir), [])
+
+
+class BatchVerificationTestCase(TestCase):
+    def setUp(self):
+        import hashlib
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .digital_signature import sign_digest
+        from .key_pool import generate_rsa_key, public_key_pem
+        from .models import Document
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("auditor", password="secret"))
+
+        private_key = generate_rsa_key()
+        self.content = b"signed document bytes"
+        self.digest = hashlib.sha256(self.content).hexdigest()
+        Document.objects.create(
+            document_id="doc-1", signature=sign_digest(bytes.fromhex(self.digest), private_key),
+            public_key=public_key_pem(private_key), text_content="",
+        )
+
+    def verify(self, data, format):
+        import json
+        response = self.client.post(reverse("verify_documents_batch"), data, format=format)
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        return {line["id"]: line for line in lines}
+
+    # A manifest of digests is checked against the stored signatures
+    def test_manifest_verification(self):
+        results = self.verify({"documents": [
+            {"id": "doc-1", "sha256": self.digest},
+            {"id": "doc-2", "sha256": self.digest},
+        ]}, format="json")
+
+        self.assertTrue(results["doc-1"]["verified"])
+        self.assertEqual(results["doc-2"]["error"], "Document not found.")
+
+    # A charset parameter on the JSON media type still selects the manifest
+    def test_manifest_with_charset(self):
+        import json
+        response = self.client.post(
+            reverse("verify_documents_batch"),
+            json.dumps({"documents": [{"id": "doc-1", "sha256": self.digest}]}),
+            content_type="application/json; charset=utf-8",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(b"".join(response.streaming_content))["verified"])
+
+        response = self.client.post(reverse("verify_documents_batch"), "[]", content_type="application/json; charset=utf-8")
+        self.assertEqual(response.status_code, 400)
+
+    # Uploaded files are matched to document IDs by position
+    def test_file_verification(self):
+        results = self.verify({
+            "ids": ["doc-1"],
+            "documents": [SimpleUploadedFile("tampered.pdf", self.content + b"!")],
+        }, format="multipart")
+
+        self.assertFalse(results["doc-1"]["verified"])
+
+
+class HashFirstVerificationTestCase(TestCase):
+    # A matching digest is accepted without the public-key operation unless a full check is requested
+    def test_digest_comparison_before_signature(self):
+        import hashlib
+        from unittest import mock
+        from .models import Document
+        from .verification import verify_document_digest, find_document_by_digest
+
+        digest = hashlib.sha256(b"signed copy").digest()
+        document = Document.objects.create(
+            document_id="doc-1", signed_hash=digest.hex(), signature=b"not a signature",
+            public_key=b"not a key", text_content="",
+        )
+
+        with mock.patch("app.verification.verify_digest") as rsa_verify, mock.patch("app.verification.load_public_key"):
+            self.assertTrue(verify_document_digest(document, digest))
+            self.assertFalse(verify_document_digest(document, hashlib.sha256(b"tampered").digest()))
+            rsa_verify.assert_not_called()
+
+            rsa_verify.return_value = False
+            self.assertFalse(verify_document_digest(document, digest, full=True))
+
+        self.assertEqual(find_document_by_digest(digest), document)
+
+
+class VerificationCacheTestCase(TemporaryStorageMixin, TestCase):
+    # Repeat QR scans are served from the cache or answered with 304 via the ETag
+    def test_qr_scan_is_cached(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        upload = SimpleUploadedFile("report.pdf", generate_pdf(), content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+
+        first = self.client.get(reverse("verify_document"), {"id": document_id})
+        self.assertContains(first, "Authentic and Untampered")
+        self.assertIn("max-age", first["Cache-Control"])
+
+        with mock.patch("app.verification.hash_file") as hash_file:
+            second = self.client.get(reverse("verify_document"), {"id": document_id})
+            hash_file.assert_not_called()
+        self.assertContains(second, "Authentic and Untampered")
+
+        revalidated = self.client.get(reverse("verify_document"), {"id": document_id}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class QRStampTestCase(TestCase):
+    # The stamp is appended after the original bytes and shows up on the last page
+    def test_incremental_stamp(self):
+        import os
+        import tempfile
+        from PyPDF2 import PdfReader
+        from .qr_code import QR_LINK_LABEL, embed_qr_code_and_link, verification_url
+
+        original = generate_pdf(pages=3)
+        with tempfile.TemporaryDirectory() as directory:
+            pdf_path = os.path.join(directory, "original.pdf")
+            output_path = os.path.join(directory, "signed.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(original)
+
+            embed_qr_code_and_link(pdf_path, verification_url("doc-1"), output_path)
+            with open(output_path, "rb") as f:
+                signed = f.read()
+
+        self.assertTrue(signed.startswith(original))
+        reader = PdfReader(BytesIO(signed), strict=True)
+        self.assertEqual(len(reader.pages), 3)
+        last_page_text = reader.pages[-1].extract_text()
+        self.assertIn(QR_LINK_LABEL, last_page_text)
+        self.assertIn(verification_url("doc-1"), last_page_text)
+        self.assertNotIn(QR_LINK_LABEL, reader.pages[0].extract_text())
+
+
+class TextSimilarityTestCase(TemporaryStorageMixin, TestCase):
+    # OCR verification tolerates case, whitespace and a few misread words, but not other text
+    def test_fingerprint_similarity(self):
+        from .text_similarity import fingerprint_similarity, text_fingerprint
+
+        original = " ".join(f"clause {i} of the agreement binds party {i % 7}" for i in range(60))
+        scanned = original.upper().replace(" ", "  \n").replace("AGREEMENT BINDS PARTY 3", "AGREEMENT B1NDS PARTY 3")
+        other = " ".join(f"invoice line {i} totals {i * 3} euro" for i in range(60))
+
+        self.assertEqual(fingerprint_similarity(text_fingerprint(original), text_fingerprint(original)), 1.0)
+        self.assertGreater(fingerprint_similarity(text_fingerprint(original), text_fingerprint(scanned)), 0.7)
+        self.assertLess(fingerprint_similarity(text_fingerprint(original), text_fingerprint(other)), 0.2)
+
+    def test_ocr_verification_reports_score(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        original = generate_pdf("The quick brown fox jumps over the lazy dog", pages=2)
+        upload = SimpleUploadedFile("report.pdf", original, content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+        self.assertIsNotNone(Document.objects.get(document_id=document_id).text_fingerprint)
+
+        with open(Document.objects.get(document_id=document_id).pdf_file.path, "rb") as signed:
+            scan = SimpleUploadedFile("scan.pdf", signed.read(), content_type="application/pdf")
+        response = self.client.post(reverse("verify_document"), {"id": document_id, "document": scan, "use_ocr": "true"}).json()
+        self.assertTrue(response["verified"])
+        self.assertEqual(response["similarity"], 1.0)
+
+
+class PdfOcrTestCase(TestCase):
+    # Scans without a text layer are OCRed page by page and reassembled in page order
+    def test_scanned_pdf_falls_back_to_page_ocr(self):
+        import tempfile
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from .pdf_ocr import extract_pdf_text_or_ocr, iter_pdf_ocr
+
+        # Image-only pages of different heights, so each OCR result names its page
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer)
+        for height in (300, 200, 100):
+            c.setPageSize((200, height))
+            c.rect(10, 10, 50, 50, fill=1)
+            c.showPage()
+        c.save()
+
+        def fake_tesseract(image, lang=None, timeout=0):
+            # Later pages finish first, the output must still be in page order
+            time.sleep(image.height / 10000)
+            return f"height {image.height * 72 // 300}"
+
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+            pdf_file.write(buffer.getvalue())
+            pdf_file.flush()
+            with mock.patch("app.pdf_ocr.get_executor", return_value=ThreadPoolExecutor(3)), \
+                    mock.patch("app.pdf_ocr.pytesseract.image_to_string", side_effect=fake_tesseract):
+                pages = list(iter_pdf_ocr(pdf_file.name))
+                text = extract_pdf_text_or_ocr(pdf_file.name)
+
+        self.assertEqual(pages, [(1, "height 300"), (2, "height 200"), (3, "height 100")])
+        self.assertEqual(text, "height 300\nheight 200\nheight 100")
+
+
+class ExtractionCacheTestCase(TemporaryStorageMixin, TestCase):
+    # A repeat OCR verification of the same upload reuses the extracted text
+    def test_repeat_ocr_verification_hits_cache(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .extraction_cache import extraction_cache
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        upload = SimpleUploadedFile("report.pdf", generate_pdf("Quarterly report"), content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+
+        def verify(**extra):
+            scan = SimpleUploadedFile("scan.png", b"same scan bytes", content_type="image/png")
+            data = {"id": document_id, "document": scan, "use_ocr": "true", **extra}
+            return self.client.post(reverse("verify_document"), data).json()
+
+        with mock.patch("app.views.extract_text_from_image", return_value="Quarterly report page 1") as ocr:
+            self.assertTrue(verify()["verified"])
+            self.assertTrue(verify()["verified"])
+            self.assertEqual(ocr.call_count, 1)
+            verify(no_cache="true")
+            self.assertEqual(ocr.call_count, 2)
+
+        self.assertGreaterEqual(extraction_cache.stats()["hits"], 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        import os
+        import tempfile
+        from .extraction_cache import ExtractionResultCache
+
+        with tempfile.TemporaryDirectory() as location:
+            cache = ExtractionResultCache({"ENABLED": True, "LOCATION": location, "MAX_BYTES": 2500})
+            for i in range(3):
+                cache.set(cache.key(f"digest-{i}", {}), "x" * 1000)
+                # Distinct mtimes even on coarse filesystem clocks
+                os.utime(cache._path(cache.key(f"digest-{i}", {})), ns=(i * 10**9, i * 10**9))
+
+            self.assertIsNone(cache.get(cache.key("digest-0", {})))
+            self.assertEqual(cache.get(cache.key("digest-2", {})), "x" * 1000)
+            self.assertEqual(cache.stats()["hits"], 1)
+            self.assertEqual(cache.stats()["misses"], 1)
+
+    # Rewriting an entry replaces its size in the total instead of adding to it
+    def test_rewritten_entry_is_counted_once(self):
+        import tempfile
+        from .extraction_cache import ExtractionResultCache
+
+        with tempfile.TemporaryDirectory() as location:
+            cache = ExtractionResultCache({"ENABLED": True, "LOCATION": location, "MAX_BYTES": 2500})
+            key = cache.key("digest", {})
+            cache.set(cache.key("other", {}), "x" * 100)
+            for _ in range(5):
+                cache.set(key, "x" * 1000)
+            cache.set(key, "x" * 400)
+
+            self.assertEqual(cache.stats()["bytes"], 500)
+            self.assertEqual(cache.get(cache.key("other", {})), "x" * 100)
+
+
+class ImagePreprocessingTestCase(TemporaryStorageMixin, TestCase):
+    # Skewed, noisy photos are straightened and binarised, with a timing per stage
+    def test_pipeline_deskews_and_binarises(self):
+        import numpy as np
+        from PIL import Image, ImageDraw
+        from .image_preprocessing import _deskew_angle, preprocess_image
+
+        image = Image.new("RGB", (1600, 1200), "white")
+        draw = ImageDraw.Draw(image)
+        for line in range(20):
+            draw.rectangle((100, 100 + line * 50, 1400, 115 + line * 50), fill="black")
+        skewed = image.rotate(2, expand=True, fillcolor="white")
+        self.assertEqual(_deskew_angle(np.asarray(skewed.convert("L"))), -2.0)
+
+        processed, timings = preprocess_image(skewed, ["grayscale", "denoise", "deskew", "threshold"])
+        self.assertEqual(list(timings), ["grayscale", "denoise", "deskew", "threshold"])
+        self.assertEqual(set(np.unique(np.asarray(processed))) - {0, 255}, set())
+        self.assertEqual(_deskew_angle(np.asarray(processed)), 0.0)
+
+    # Photos claiming 72 DPI are sized by the page they show, not by their metadata
+    def test_downscale_ignores_implausible_dpi(self):
+        from PIL import Image
+        from .image_preprocessing import PAGE_HEIGHT_INCHES, _downscale
+
+        photo = Image.new("L", (3000, 4000), 255)
+        photo.info["dpi"] = (72, 72)
+        self.assertEqual(max(_downscale(photo, 300).size), PAGE_HEIGHT_INCHES * 300)
+
+        # A small image whose 72 DPI fits a page is left alone
+        thumbnail = Image.new("L", (600, 800), 255)
+        thumbnail.info["dpi"] = (72, 72)
+        self.assertEqual(_downscale(thumbnail, 300).size, (600, 800))
+
+    def test_stages_selected_per_request(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from PIL import Image
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        upload = SimpleUploadedFile("report.pdf", generate_pdf("Quarterly report"), content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+
+        photo = BytesIO()
+        Image.new("RGB", (400, 300), "white").save(photo, format="PNG")
+        scan = SimpleUploadedFile("scan.png", photo.getvalue(), content_type="image/png")
+        with mock.patch("app.utils.pytesseract.image_to_string", return_value="Quarterly report page 1"):
+            response = self.client.post(reverse("verify_document"), {
+                "id": document_id, "document": scan, "use_ocr": "true", "preprocess": "grayscale,threshold",
+            }).json()
+        self.assertTrue(response["verified"])
+        self.assertEqual(list(response["preprocessing_ms"]), ["grayscale", "threshold"])
+
+        scan = SimpleUploadedFile("scan.png", photo.getvalue(), content_type="image/png")
+        response = self.client.post(reverse("verify_document"), {"id": document_id, "document": scan, "use_ocr": "true", "preprocess": "sharpen"})
+        self.assertEqual(response.status_code, 400)
+
+
+class DocumentListTestCase(TestCase):
+    # Cursor pages walk every document exactly once, newest first, with filters applied
+    def setUp(self):
+        from datetime import datetime, timedelta, timezone
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        self.user = User.objects.create_user("signer", password="secret")
+        other = User.objects.create_user("other", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        # Several documents share a timestamp so ties are broken by id
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(25):
+            document = Document.objects.create(
+                document_id=f"doc-{i}", document_name=f"{'invoice' if i % 2 else 'report'}-{i}",
+                signature=b"sig", public_key=b"key", text_content="", owner=self.user if i < 20 else other,
+            )
+            Document.objects.filter(pk=document.pk).update(created_at=start + timedelta(days=i // 3))
+
+    def fetch_all(self, url, params):
+        names = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            names += [document["document_name"] for document in response.json()["results"]]
+            url, params = response.json()["next"], None
+        return names
+
+    def test_cursor_pages(self):
+        from .models import Document
+
+        expected = [d.document_name for d in Document.objects.order_by("-created_at", "-id")]
+        self.assertEqual(self.fetch_all(reverse("list_documents"), {"page_size": 4}), expected)
+
+        reports = self.fetch_all(reverse("list_documents"), {"page_size": 4, "name": "report", "owner": "me", "created_after": "2024-01-03"})
+        self.assertEqual(reports, [n for n in expected[5:20] if n.startswith("report")])
+
+        self.assertEqual(self.client.get(reverse("list_documents"), {"cursor": "bogus"}).status_code, 400)
+
+    # A page deep in the list starts its index scan at the cursor instead of walking past earlier rows
+    def test_cursor_query_uses_range_scan(self):
+        from django.db import connection
+        from .models import Document
+        from .pagination import KeysetPagination
+
+        last = Document.objects.order_by("-created_at", "-id").values("created_at", "id")[10]
+        paginator = KeysetPagination()
+        request = self.client.get(reverse("list_documents")).wsgi_request
+        request.query_params = {"cursor": paginator.encode_cursor(last["created_at"], last["id"])}
+        queryset, _ = paginator.page_queryset(Document.objects.values("id", "document_name", "created_at"), request)
+        if connection.vendor == "sqlite":
+            plan = queryset.explain()
+            self.assertIn("document_created_idx", plan)
+            self.assertIn("created_at<?", plan.replace(" ", ""))
+
+    # The name filter is a range document_name_idx can seek, and matches case-sensitively everywhere
+    def test_name_prefix_uses_index(self):
+        from django.db import connection
+        from .models import Document
+        from .pagination import _name_prefix
+
+        queryset = Document.objects.filter(_name_prefix("report")).values("document_name")
+        self.assertEqual(queryset.count(), 13)
+        self.assertFalse(Document.objects.filter(_name_prefix("Report")).exists())
+        if connection.vendor == "sqlite":
+            self.assertIn("document_name_idx", queryset.explain())
+
+    def test_page_number_compatibility(self):
+        response = self.client.get(reverse("list_documents"), {"page": 3}).json()
+        self.assertEqual(response["count"], 25)
+        self.assertEqual(len(response["results"]), 5)
+
+
+class SearchTestCase(TestCase):
+    # The index follows inserts, bulk inserts, updates and deletes, and ranks name matches first
+    def test_ranked_search_with_snippets(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+        from .search import rebuild_search_index
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+
+        def create(document_id, name, text):
+            return Document(document_id=document_id, document_name=name, text_content=text, signature=b"sig", public_key=b"key")
+
+        create("lease", "Lease agreement", "The tenant pays rent monthly.").save()
+        Document.objects.bulk_create([
+            create("invoice", "Invoice 42", "Payment terms of the lease agreement: thirty days."),
+            create("minutes", "Board minutes", "Nothing relevant here."),
+        ])
+
+        def search(query):
+            return client.get(reverse("search_documents"), {"q": query}).json()["results"]
+
+        results = search("lease agreement")
+        self.assertEqual([r["document_name"] for r in results], ["Lease agreement", "Invoice 42"])
+        self.assertIn("<b>lease</b>", results[1]["snippet"])
+        self.assertEqual([r["document_name"] for r in search('thir* "lease')], ["Invoice 42"])
+
+        Document.objects.filter(document_id="minutes").update(text_content="Renewal of the lease agreement.")
+        Document.objects.filter(document_id="invoice").delete()
+        self.assertEqual({r["document_name"] for r in search("lease")}, {"Lease agreement", "Board minutes"})
+
+        rebuild_search_index()
+        self.assertEqual(len(search("lease")), 2)
+        self.assertEqual(client.get(reverse("search_documents")).status_code, 400)
+
+        # Databases without a full-text index are searched with substring filters
+        from unittest import mock
+        from django.db import connection
+        with mock.patch.object(connection, "vendor", "mysql"):
+            results = search("LEASE agreement")
+        self.assertEqual([r["document_name"] for r in results], ["Lease agreement", "Board minutes"])
+        self.assertIn("<b>lease</b>", results[1]["snippet"])
+
+
+class DownloadTestCase(TemporaryStorageMixin, TestCase):
+    # Downloads answer Range and conditional requests, can be offloaded, and export as a streamed zip
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        self.documents = []
+        for name in ("report", "report"):
+            upload = SimpleUploadedFile(f"{name}.pdf", generate_pdf(name), content_type="application/pdf")
+            document_id = self.client.post(reverse("create_signed_document"), {"document": upload, "document_name": name}, format="multipart").json()["document_id"]
+            self.documents.append(Document.objects.get(document_id=document_id))
+
+    def test_range_and_conditional_requests(self):
+        from django.test import override_settings
+
+        document = self.documents[0]
+        url = reverse("download_document", args=[document.id])
+        with open(document.pdf_file.path, "rb") as f:
+            content = f.read()
+
+        response = self.client.get(url)
+        self.assertEqual(b"".join(response.streaming_content), content)
+        self.assertEqual(response["ETag"], f'"{document.signed_hash}"')
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+        partial = self.client.get(url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial["Content-Range"], f"bytes 10-19/{len(content)}")
+        self.assertEqual(b"".join(partial.streaming_content), content[10:20])
+        self.assertEqual(b"".join(self.client.get(url, HTTP_RANGE="bytes=-5").streaming_content), content[-5:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f"bytes={len(content)}-").status_code, 416)
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"stale"').status_code, 200)
+
+        with override_settings(DOWNLOAD_SENDFILE="x-accel-redirect"):
+            offloaded = self.client.get(url)
+        self.assertEqual(offloaded["X-Accel-Redirect"], f"/protected/{document.pdf_file.name}")
+        self.assertEqual(offloaded.content, b"")
+
+        # Names with spaces, reserved or non-ASCII characters are percent-encoded
+        from .downloads import _sendfile_response
+        document.pdf_file.name = "documents/Q3 report 100%?ü.pdf"
+        with override_settings(DOWNLOAD_SENDFILE="x-accel-redirect"):
+            self.assertEqual(_sendfile_response(document.pdf_file)["X-Accel-Redirect"], "/protected/documents/Q3%20report%20100%25%3F%C3%BC.pdf")
+        with override_settings(DOWNLOAD_SENDFILE="x-sendfile"):
+            self.assertTrue(_sendfile_response(document.pdf_file)["X-Sendfile"].endswith("/documents/Q3%20report%20100%25%3F%C3%BC.pdf"))
+
+    def test_zip_export(self):
+        import zipfile
+
+        ids = ",".join(str(document.id) for document in self.documents)
+        response = self.client.get(reverse("export_documents"), {"ids": ids})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+        self.assertEqual(archive.namelist(), ["report.pdf", f"report-{self.documents[1].document_id}.pdf"])
+        with open(self.documents[1].pdf_file.path, "rb") as f:
+            self.assertEqual(archive.read(archive.namelist()[1]), f.read())
+        self.assertEqual(self.client.get(reverse("export_documents"), {"ids": "x"}).status_code, 400)
+
+
+class PageHashTestCase(TemporaryStorageMixin, TestCase):
+    # The signature covers per-page hashes, so edits are localised and single pages verify alone
+    def test_tampered_page_is_reported(self):
+        from django.contrib.auth.models import User
+        from PyPDF2 import PdfReader, PdfWriter
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        upload = SimpleUploadedFile("contract.pdf", generate_pdf("Contract", pages=3), content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+        document = Document.objects.get(document_id=document_id)
+        self.assertIsNotNone(document.merkle_root)
+
+        with open(document.pdf_file.path, "rb") as f:
+            signed = f.read()
+
+        def verify(content, **extra):
+            scan = SimpleUploadedFile("contract.pdf", content, content_type="application/pdf")
+            return self.client.post(reverse("verify_document"), {"id": document_id, "document": scan, **extra}).json()
+
+        self.assertTrue(verify(signed, full="true")["verified"])
+
+        # Rewrite the file with extra text drawn on page 2 only
+        overlay = PdfReader(BytesIO(generate_pdf("Amended")))
+        writer = PdfWriter()
+        for number, page in enumerate(PdfReader(BytesIO(signed)).pages, start=1):
+            if number == 2:
+                page.merge_page(overlay.pages[0])
+            writer.add_page(page)
+        tampered = BytesIO()
+        writer.write(tampered)
+
+        result = verify(tampered.getvalue())
+        self.assertFalse(result["verified"])
+        self.assertEqual(result["changed_pages"], [2])
+        self.assertEqual(verify(tampered.getvalue(), pages="1")["pages"], {"1": True})
+        self.assertEqual(verify(tampered.getvalue(), pages="2-3")["pages"], {"2": False, "3": True})
+
+        # An annotation added to page 2 draws over it without touching its content stream
+        from PyPDF2.generic import AnnotationBuilder
+        writer = PdfWriter()
+        for page in PdfReader(BytesIO(signed)).pages:
+            writer.add_page(page)
+        writer.add_annotation(1, AnnotationBuilder.free_text("VOID", rect=(50, 550, 200, 650)))
+        annotated = BytesIO()
+        writer.write(annotated)
+        self.assertEqual(verify(annotated.getvalue(), pages="1-3")["pages"], {"1": True, "2": False, "3": True})
+
+    def test_inclusion_proofs(self):
+        from .merkle import inclusion_proof, leaf_hash, merkle_root, root_from_proof
+
+        for size in (1, 2, 5, 8, 13):
+            leaves = [leaf_hash(bytes([i])) for i in range(size)]
+            root = merkle_root(leaves)
+            for index in range(size):
+                self.assertEqual(root_from_proof(leaves[index], index, size, inclusion_proof(leaves, index)), root)
+            self.assertNotEqual(root_from_proof(leaf_hash(b"other"), 0, size, inclusion_proof(leaves, 0)), root)
+
+
+class SignatureBatchTestCase(TemporaryStorageMixin, TestCase):
+    # Documents signed together share one signature over the root of their digests
+    def test_batch_upload_shares_one_signature(self):
+        import json
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .models import Document, SignatureBatch
+        from .verification import verify_document_digest
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("issuer", password="secret"))
+        uploads = [
+            SimpleUploadedFile(f"diploma-{i}.pdf", generate_pdf(f"Diploma {i}"), content_type="application/pdf")
+            for i in range(3)
+        ]
+        with override_settings(SIGNATURE_BATCHING=True, SIGNATURE_BATCH_WINDOW=30):
+            response = client.post(reverse("create_signed_documents_batch"), {"documents": uploads}, format="multipart")
+            lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[-1], {"signed": 3, "failed": 0})
+
+        batch = SignatureBatch.objects.get()
+        self.assertEqual(batch.size, 3)
+        documents = list(Document.objects.metadata().filter(signature_batch=batch).order_by("batch_index"))
+        self.assertEqual([document.batch_index for document in documents], [0, 1, 2])
+        for document in documents:
+            self.assertEqual(bytes(document.signature), b"")
+            self.assertTrue(verify_document_digest(document, bytes.fromhex(document.signed_hash), full=True))
+
+        # A proof taken from another leaf does not reach the signed root
+        documents[0].batch_proof = documents[1].batch_proof
+        self.assertFalse(verify_document_digest(documents[0], bytes.fromhex(documents[0].signed_hash), full=True))
+
+    def test_single_upload_is_signed_through_the_batch_signer(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        upload = SimpleUploadedFile("letter.pdf", generate_pdf("Letter"), content_type="application/pdf")
+        with override_settings(SIGNATURE_BATCHING=True):
+            document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+
+        with open(Document.objects.get(document_id=document_id).pdf_file.path, "rb") as f:
+            scan = SimpleUploadedFile("letter.pdf", f.read(), content_type="application/pdf")
+        result = self.client.post(reverse("verify_document"), {"id": document_id, "document": scan, "full": "true"}).json()
+        self.assertTrue(result["verified"])
+        self.assertEqual(Document.objects.get(document_id=document_id).signature_batch.size, 1)
+
+
+class SignatureAlgorithmTestCase(TemporaryStorageMixin, TestCase):
+    # Every algorithm signs and verifies end to end, and documents record which one they use
+    def test_each_algorithm_round_trips(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .digital_signature import SIGNERS
+        from .models import Document
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+        for algorithm in SIGNERS:
+            with self.subTest(algorithm=algorithm), override_settings(SIGNATURE_ALGORITHM=algorithm):
+                upload = SimpleUploadedFile("deed.pdf", generate_pdf(f"Deed {algorithm}"), content_type="application/pdf")
+                document_id = client.post(reverse("create_signed_document"), {"document": upload}, format="multipart").json()["document_id"]
+                document = Document.objects.get(document_id=document_id)
+                self.assertEqual(document.signature_algorithm, algorithm)
+
+                with open(document.pdf_file.path, "rb") as f:
+                    scan = SimpleUploadedFile("deed.pdf", f.read(), content_type="application/pdf")
+                result = self.client.post(reverse("verify_document"), {"id": document_id, "document": scan, "full": "true"}).json()
+                self.assertTrue(result["verified"])
+
+    def test_signature_is_bound_to_its_algorithm(self):
+        import hashlib
+        from .digital_signature import ECDSA_P256, ED25519, RSA_PSS, SIGNERS, sign_digest, verify_digest
+
+        digest = hashlib.sha256(b"content").digest()
+        private_key = SIGNERS[ED25519].generate_key()
+        signature = sign_digest(digest, private_key)
+        self.assertTrue(verify_digest(digest, signature, private_key.public_key(), ED25519))
+        self.assertFalse(verify_digest(digest, signature, private_key.public_key(), RSA_PSS))
+        self.assertFalse(verify_digest(digest, signature, SIGNERS[ECDSA_P256].generate_key().public_key(), ECDSA_P256))
+
+
+class InstrumentationTestCase(TemporaryStorageMixin, TestCase):
+    # Stages are timed into histograms and the Server-Timing header only while metrics are on
+    def test_stages_are_reported(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .instrumentation import registry
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("signer", password="secret"))
+
+        def sign():
+            upload = SimpleUploadedFile("memo.pdf", generate_pdf("Memo"), content_type="application/pdf")
+            return client.post(reverse("create_signed_document"), {"document": upload}, format="multipart")
+
+        self.assertNotIn("Server-Timing", sign())
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+        registry.reset()
+        with override_settings(METRICS_ENABLED=True):
+            response = sign()
+            stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+            for stage in ("store_upload", "extract_text", "signing_key", "embed_qr", "hash_file", "page_digests", "sign", "db_save", "total"):
+                self.assertIn(stage, stages)
+
+            metrics = self.client.get(reverse("metrics"))
+            self.assertEqual(metrics["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+            body = metrics.content.decode()
+            self.assertIn('pipeline_stage_duration_seconds_count{stage="embed_qr"} 1', body)
+            self.assertIn('pipeline_stage_duration_seconds_bucket{stage="embed_qr",le="+Inf"} 1', body)
+            self.assertIn('http_request_duration_seconds_count{method="POST",view="create_signed_document"} 1', body)
+
+
+class LoadTestingTestCase(TemporaryStorageMixin, LiveServerTestCase):
+    # A short sweep of the asyncio clients against a live server
+    def test_sweep_reports_every_endpoint(self):
+        import asyncio
+        from urllib.parse import urlsplit
+        from django.contrib.auth.models import User
+        from .load_testing import DEFAULT_MIX, Session, parse_mix, run_sweep
+
+        User.objects.create_user("load-test", password="secret")
+        address = urlsplit(self.live_server_url)
+        levels = asyncio.run(run_sweep(
+            address.hostname, address.port, Session("load-test", "secret"), DEFAULT_MIX, [1, 2], 0.5, seed_documents=2,
+        ))
+
+        self.assertEqual([level["concurrency"] for level in levels], [1, 2])
+        for level in levels:
+            self.assertGreater(level["requests"], 0)
+            self.assertEqual(level["error_rate"], 0.0)
+            self.assertEqual(set(level["endpoints"]), set(DEFAULT_MIX))
+        self.assertEqual(parse_mix("verify=3,list"), {"verify": 3.0, "list": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("delete=1")
+
+
+class AsyncViewsTestCase(TemporaryStorageMixin, TestCase):
+    # The async verification, download and listing views answer like the synchronous ones
+    def test_async_views_match_sync_views(self):
+        from asgiref.sync import async_to_sync
+        from django.contrib.auth.models import User
+        from django.test import AsyncRequestFactory
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from . import async_views
+        from .models import Document
+
+        user = User.objects.create_user("signer", password="secret")
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        client = Client(headers=headers)
+        upload = SimpleUploadedFile("report.pdf", generate_pdf("Report"), content_type="application/pdf")
+        document_id = client.post(reverse("create_signed_document"), {"document": upload, "document_name": "report"}).json()["document_id"]
+        document = Document.objects.get(document_id=document_id)
+        factory = AsyncRequestFactory()
+
+        verify_url = reverse("verify_document")
+        response = async_to_sync(async_views.verify_document)(factory.get(verify_url, {"id": document_id}))
+        self.assertIn(b"Authentic and Untampered", response.content)
+        self.assertEqual(response["ETag"], self.client.get(verify_url, {"id": document_id})["ETag"])
+        not_modified = async_to_sync(async_views.verify_document)(
+            factory.get(verify_url, {"id": document_id}, headers={"If-None-Match": response["ETag"]})
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        download_url = reverse("download_document", args=[document.id])
+
+        async def download(**request_headers):
+            response = await async_views.download_document(factory.get(download_url, headers=request_headers), str(document.id))
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(download)(**headers)
+        self.assertEqual(content, b"".join(client.get(download_url).streaming_content))
+        self.assertEqual(int(response["Content-Length"]), len(content))
+        response, partial = async_to_sync(download)(Range="bytes=0-9", **headers)
+        self.assertEqual((response.status_code, partial), (206, content[:10]))
+        self.assertEqual(async_to_sync(async_views.download_document)(factory.get(download_url), str(document.id)).status_code, 401)
+
+        list_url = reverse("list_documents")
+        response = async_to_sync(async_views.list_documents)(factory.get(list_url, headers=headers))
+        self.assertEqual(json.loads(response.content), client.get(list_url).json())
+
+        # Under ASGI, the timing middleware runs as a coroutine
+        from django.test import override_settings
+        from .instrumentation import registry
+        registry.reset()
+        with override_settings(METRICS_ENABLED=True):
+            response = async_to_sync(self.async_client.get)(verify_url, {"id": document_id})
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="verify_document"} 1', registry.render())
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .blob_store import blob_store
+from .qr_code import QR_LINK_LABEL, verification_url
+from .extraction_cache import extraction_cache
+from .pdf_ocr import extract_pdf_text_or_ocr, pdf_extraction_config
+
+
+class ExtractionCache:
+    """
+    Thread-safe LRU of extracted text keyed by content hash.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+text_cache = ExtractionCache(settings.TEXT_EXTRACTION_CACHE_SIZE)
+
+# One lock per content hash so concurrent uploads of the same file extract it once
+_hash_locks = {}
+_hash_locks_guard = threading.Lock()
+
+
+def _lock_for(content_hash):
+    with _hash_locks_guard:
+        return _hash_locks.setdefault(content_hash, threading.Lock())
+
+
+def _stored_text_for_hash(content_hash):
+    # Any document already signed from the same content carries the text we need
+    from .models import Document
+
+    return (
+        Document.objects.filter(hash=content_hash, text_content__isnull=False)
+        .values_list("text_content", flat=True)
+        .first()
+    )
+
+
+def cached_pdf_text(content_hash):
+    """
+    Return already extracted text for a content hash without extracting, or None.
+    """
+    text = text_cache.get(content_hash)
+    if text is None:
+        text = _stored_text_for_hash(content_hash)
+        if text is not None:
+            text_cache.set(content_hash, text)
+    return text
+
+
+def extract_pdf_text(content_hash, path=None):
+    """
+    Return the text of the PDF with the given content hash, extracting it at
+    most once.
+
+    Looks in the in-process cache first, then reuses the text of any document
+    already signed from the same content, then the on-disk extraction cache,
+    and only then runs PyPDF2 over the file at `path` (by default the
+    original in the blob store), with page OCR for scans that have no text
+    layer.
+    """
+    text = text_cache.get(content_hash)
+    if text is not None:
+        return text
+
+    with _lock_for(content_hash):
+        # Another request may have finished the extraction while we waited
+        text = text_cache.get(content_hash)
+        if text is None:
+            text = _stored_text_for_hash(content_hash)
+        if text is None:
+            text = extraction_cache.get_or_extract(
+                content_hash, pdf_extraction_config(),
+                lambda: extract_pdf_text_or_ocr(path or blob_store.path(content_hash)),
+            )
+        text_cache.set(content_hash, text)
+
+    with _hash_locks_guard:
+        _hash_locks.pop(content_hash, None)
+    return text
+
+
+def strip_verification_stamp(text, document_id):
+    """
+    Remove the QR stamp text ("Verify document:" and the link) that signing
+    adds to the last page, so signed copies compare equal to their original.
+    """
+    for stamp in (QR_LINK_LABEL, verification_url(document_id)):
+        text = text.replace(stamp, "")
+    return text
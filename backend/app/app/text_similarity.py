@@ -0,0 +1,82 @@
+import hashlib
+import re
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+
+# Shingle hashes are permuted as (a * x + b) mod MINHASH_PRIME, with a < 2**31 so
+# the product of a 32-bit hash and a never overflows 64 bits
+MINHASH_PRIME = (1 << 32) + 15
+MINHASH_SEED = 20241018
+
+# Shingles are hashed through the permutations in chunks to bound memory use
+MINHASH_CHUNK_SIZE = 8192
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """
+    Fold case, Unicode forms and whitespace, and split the text into word tokens.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _TOKEN_RE.findall(text)
+
+
+def shingle_hashes(tokens, size):
+    """
+    Return the 32-bit hashes of the distinct `size`-token shingles.
+
+    Texts shorter than one shingle are treated as a single shingle.
+    """
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    count = max(1, len(tokens) - size + 1)
+    shingles = {" ".join(tokens[i:i + size]) for i in range(count)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+def _permutations(num_perm):
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def text_fingerprint(text):
+    """
+    MinHash fingerprint of a text, as OCR_MINHASH_PERMUTATIONS little-endian uint32 values.
+
+    An empty text has an all-ones fingerprint, which only matches another empty text.
+    """
+    num_perm = settings.OCR_MINHASH_PERMUTATIONS
+    hashes = shingle_hashes(normalize_text(text), settings.OCR_SHINGLE_SIZE)
+    a, b = _permutations(num_perm)
+
+    signature = np.full(num_perm, 0xFFFFFFFF, dtype=np.uint64)
+    for start in range(0, len(hashes), MINHASH_CHUNK_SIZE):
+        chunk = hashes[start:start + MINHASH_CHUNK_SIZE, None]
+        permuted = (chunk * a + b) % MINHASH_PRIME & 0xFFFFFFFF
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype("<u4").tobytes()
+
+
+def fingerprint_similarity(fingerprint_a, fingerprint_b):
+    """
+    Estimate the Jaccard similarity of two texts from their fingerprints (0.0 to 1.0).
+    """
+    a = np.frombuffer(bytes(fingerprint_a), dtype="<u4")
+    b = np.frombuffer(bytes(fingerprint_b), dtype="<u4")
+    if len(a) != len(b) or not len(a):
+        raise ValueError("Fingerprints were computed with different settings.")
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def is_current_fingerprint(fingerprint):
+    # Fingerprints from before a change of OCR_MINHASH_PERMUTATIONS have to be recomputed
+    return fingerprint is not None and len(fingerprint) == settings.OCR_MINHASH_PERMUTATIONS * 4
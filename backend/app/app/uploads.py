@@ -0,0 +1,43 @@
+import hashlib
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spool every upload straight to a temporary file and compute its SHA-256
+    while the chunks stream in, so the content is never held in memory and
+    never has to be read back just to be hashed.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.hasher.hexdigest()
+        return uploaded_file
+
+
+def uploaded_file_digest(uploaded_file):
+    """
+    Return the hex SHA-256 of an uploaded file.
+
+    Uses the digest computed by HashingFileUploadHandler when available and
+    otherwise streams the file chunk by chunk.
+    """
+    digest = getattr(uploaded_file, "sha256", None)
+    if digest:
+        return digest
+
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    uploaded_file.sha256 = hasher.hexdigest()
+    return uploaded_file.sha256
@@ -1,20 +1,33 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from django.contrib.auth.views import LoginView, LogoutView
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+# The QR-scan verification, download and listing views in their async versions, for ASGI
+document_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('verify/', views.verify_document, name='verify_document'),
+    path('verify/', document_views.verify_document, name='verify_document'),
+    path('verify_batch/', views.verify_documents_batch, name='verify_documents_batch'),
     path('login/', views.login_view, name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('create_signed_document/', views.create_signed_document, name='create_signed_document'),
-    path('download/<str:document_id>/', views.download_document, name='download_document'),
-    path('documents/', views.list_documents, name='list_documents'),
+    path('create_signed_documents_batch/', views.create_signed_documents_batch, name='create_signed_documents_batch'),
+    path('jobs/<str:job_id>/', views.signing_job_status, name='signing_job_status'),
+    path('jobs/<str:job_id>/result/', views.signing_job_result, name='signing_job_result'),
+    path('download/<str:document_id>/', document_views.download_document, name='download_document'),
+    path('export/', views.export_documents, name='export_documents'),
+    path('documents/', document_views.list_documents, name='list_documents'),
+    path('search/', views.search_documents_view, name='search_documents'),
     path('create_user/', views.create_user, name='create_user'),
     path("users/", views.list_users, name="list_users"),
     path("users/<int:user_id>/", views.update_user, name="update_user"),
+    path('key_pool/', views.key_pool_status, name='key_pool_status'),
+    path('extraction_cache/', views.extraction_cache_status, name='extraction_cache_status'),
+    path('signature_batches/', views.signature_batch_status, name='signature_batch_status'),
+    path('metrics/', views.metrics, name='metrics'),
     path('user_info/', views.user_info, name='user_info'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -1,16 +1,23 @@
 from PyPDF2 import PdfReader
 from io import BytesIO
 import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
-import numpy as np
+from PIL import Image
+from .image_preprocessing import preprocess_image
+from .instrumentation import timed
 
+
+class NoTextLayerError(ValueError):
+    """
+    The PDF has pages but no extractable text, e.g. a scan; OCR is needed.
+    """
+
+
+@timed("extract_text")
 def extract_text_from_pdf(file):
     try:
-        # Read the binary content of the file
-        pdf_file = file.read()
-
-        # Attempt to read the PDF with PyPDF2
-        pdf_reader = PdfReader(BytesIO(pdf_file))
+        # Read the PDF with PyPDF2 straight from the (seekable) file instead of copying it into memory
+        file.seek(0)
+        pdf_reader = PdfReader(file)
         if len(pdf_reader.pages) == 0:
             raise ValueError("The PDF file is empty.")
 
@@ -20,46 +27,31 @@ def extract_text_from_pdf(file):
             extracted_text += page.extract_text() or ""
 
         if not extracted_text:
-            raise ValueError("No text could be extracted from the PDF.")
+            raise NoTextLayerError("Failed to extract text from PDF: No text could be extracted from the PDF.")
         
         return extracted_text
+    except NoTextLayerError:
+        raise
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
     
 
-def preprocess_image(image):
-    """
-    Preprocess the image for better OCR results.
-    - Convert to grayscale
-    - Enhance contrast
-    - Resize for better resolution
-    """
-    # Convert to grayscale (L mode)
-    image = image.convert("L")
-    
-    # Enhance contrast
-    enhancer = ImageEnhance.Contrast(image)
-    image = enhancer.enhance(2)
-
-    # Apply a filter to reduce noise
-    image = image.filter(ImageFilter.MedianFilter())
-
-    # Resize to double the size for better OCR accuracy
-    image = image.resize((image.width * 2, image.height * 2), Image.LANCZOS)
-
-    return image
-
-
-def extract_text_from_image(image_file):
+@timed("ocr_image")
+def extract_text_from_image(image_file, stages=(), target_dpi=300, timings=None):
     """
     Extracts text from an uploaded image file using Tesseract OCR.
+
+    `stages` selects the preprocessing steps (see image_preprocessing); their
+    durations in milliseconds are added to `timings` when it is given.
     """
     try:
         # Open the image file
         image = Image.open(BytesIO(image_file.read()))
         
         # Preprocess the image
-        # image = preprocess_image(image)
+        image, stage_timings = preprocess_image(image, stages, target_dpi)
+        if timings is not None:
+            timings.update(stage_timings)
 
         # Perform OCR using Tesseract
         extracted_text = pytesseract.image_to_string(image, lang="eng")
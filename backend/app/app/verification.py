@@ -0,0 +1,232 @@
+import hashlib
+import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .digital_signature import hash_file, load_public_key, verify_digest
+from .instrumentation import timed
+from .merkle import document_root, page_count, page_digests, unpack_digests
+from .models import Document
+from .signature_batches import verify_inclusion
+from .text_extraction import strip_verification_stamp
+from .text_similarity import fingerprint_similarity, is_current_fingerprint, text_fingerprint
+from .uploads import uploaded_file_digest
+from .verification_cache import verification_cache
+
+_executor = ThreadPoolExecutor(max_workers=settings.BATCH_VERIFICATION_WORKERS, thread_name_prefix="verify")
+
+
+def verify_document_digest(document, digest, full=False):
+    """
+    Check a SHA-256 digest of a signed copy against the document.
+
+    The digest is first compared in constant time with the stored digest of
+    the signed copy; a mismatch fails without touching the public key, and a
+    match is accepted unless `full` asks for the signature verification as well.
+    Documents without a stored digest always get the signature check.
+    """
+    if document.signed_hash:
+        if not hmac.compare_digest(document.signed_hash, digest.hex()):
+            return False
+        if not full:
+            return True
+
+    return verify_signed_message(document, signed_message(document, digest))
+
+
+def signed_message(document, digest):
+    """
+    The digest the document's signature covers, given the digest of its signed copy.
+
+    Documents with page hashes are signed over the Merkle root of the file
+    digest and the stored page digests; older documents over the file digest.
+    """
+    if document.merkle_root:
+        return document_root(digest, unpack_digests(document.page_hashes))
+    return digest
+
+
+def verify_signed_message(document, message):
+    """
+    Check the document's signature over `message`: directly, or for
+    Merkle-batched documents through the inclusion proof and the batch root signature.
+    """
+    if document.signature_batch_id:
+        return verify_inclusion(document, message)
+    return verify_digest(
+        message, bytes(document.signature), load_public_key(bytes(document.public_key)), document.signature_algorithm
+    )
+
+
+def _page_digests_of(path, pages=None):
+    # Large PDFs are hashed across the batch process pool
+    from .batch import get_executor
+
+    return page_digests(path, pages, executor=get_executor())
+
+
+@timed("locate_tampering")
+def locate_tampering(document, path):
+    """
+    Compare the pages of a PDF with the page digests recorded at sign time.
+
+    Returns {"changed_pages": [1-based page numbers], "page_count", "expected_page_count"},
+    or None when the document has no page digests or the file cannot be parsed.
+    """
+    if not document.page_hashes:
+        return None
+    expected = unpack_digests(document.page_hashes)
+    try:
+        actual = _page_digests_of(path)
+    except Exception:
+        return None
+
+    changed = [number for number, (a, b) in enumerate(zip(actual, expected), start=1) if a != b]
+    # Pages added or removed at the end count as changed too
+    changed += list(range(min(len(actual), len(expected)) + 1, max(len(actual), len(expected)) + 1))
+    return {"changed_pages": changed, "page_count": len(actual), "expected_page_count": len(expected)}
+
+
+def verify_pages(document, path, first_page, last_page):
+    """
+    Verify pages first_page..last_page (1-based, inclusive) of a PDF without hashing the rest of it.
+
+    The stored page digests are authenticated by checking the signature over
+    their Merkle root, then the requested pages are compared with them.
+    Returns {page number: bool}; raises ValueError for documents signed
+    without page digests or pages out of range.
+    """
+    if not document.merkle_root:
+        raise ValueError("This document was signed without page hashes; verify the whole file instead.")
+    expected = unpack_digests(document.page_hashes)
+    if not 1 <= first_page <= last_page <= len(expected):
+        raise ValueError(f"Pages must be within 1-{len(expected)}.")
+
+    root = document_root(bytes.fromhex(document.signed_hash), expected)
+    if not hmac.compare_digest(root.hex(), document.merkle_root) or not verify_signed_message(document, root):
+        return {number: False for number in range(first_page, last_page + 1)}
+
+    # Pages the uploaded file does not have fail
+    available_last_page = min(last_page, page_count(path))
+    actual = _page_digests_of(path, range(first_page - 1, available_last_page)) if available_last_page >= first_page else []
+    results = {number: False for number in range(first_page, last_page + 1)}
+    for number, digest in zip(range(first_page, available_last_page + 1), actual):
+        results[number] = hmac.compare_digest(digest, expected[number - 1])
+    return results
+
+
+def stored_copy_etag(fingerprint):
+    """
+    Strong ETag for the verification page of a stored copy with the given fingerprint.
+    """
+    return '"%s"' % hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+
+def verify_stored_copy(document, fingerprint):
+    """
+    Verify the signed copy on disk, reusing a cached result while the file
+    and signature are unchanged.
+    """
+    verified = verification_cache.get(document.document_id, fingerprint)
+    if verified is None:
+        verified = verify_document_digest(document, hash_file(document.pdf_file.path))
+        verification_cache.set(document.document_id, fingerprint, verified)
+    return verified
+
+
+@timed("ocr_similarity")
+def ocr_similarity(document, extracted_text):
+    """
+    Score text read back from a scan or PDF against the document's stored
+    fingerprint, as an estimated Jaccard similarity of their word shingles.
+    """
+    stored_fingerprint = document.text_fingerprint
+    if not is_current_fingerprint(stored_fingerprint):
+        # Documents signed before fingerprints existed (or with other settings) get one now
+        stored_text = strip_verification_stamp(document.text_content or "", document.document_id)
+        stored_fingerprint = text_fingerprint(stored_text)
+        Document.objects.filter(pk=document.pk).update(text_fingerprint=stored_fingerprint)
+
+    extracted_fingerprint = text_fingerprint(strip_verification_stamp(extracted_text, document.document_id))
+    return fingerprint_similarity(extracted_fingerprint, stored_fingerprint)
+
+
+def find_document_by_digest(digest):
+    """
+    Identify a document from the digest of its signed copy alone.
+    """
+    return Document.objects.metadata().filter(signed_hash=digest.hex()).first()
+
+
+def collect_verification_items(request):
+    """
+    Return [(document_id, hex digest)] from a batch verification request.
+
+    Accepts either a JSON manifest {"documents": [{"id": ..., "sha256": ...}]}
+    or multipart `ids` and `documents` lists matched by position.
+    """
+    # The media type may carry parameters, e.g. "application/json; charset=utf-8"
+    if request.content_type.split(";")[0].strip().lower() == "application/json":
+        if not isinstance(request.data, dict):
+            raise ValueError("The manifest must be a JSON object with a \"documents\" list.")
+        manifest = request.data.get("documents") or []
+        if not isinstance(manifest, list) or not all(isinstance(entry, dict) for entry in manifest):
+            raise ValueError("The manifest must be a list of {\"id\", \"sha256\"} objects.")
+        items = [(str(entry.get("id", "")), str(entry.get("sha256", "")).lower()) for entry in manifest]
+    else:
+        ids = request.data.getlist("ids")
+        uploaded_files = request.FILES.getlist("documents")
+        if len(ids) != len(uploaded_files):
+            raise ValueError("Every uploaded document needs a matching id.")
+        # The upload handler already hashed each file while it was received
+        items = [(document_id, uploaded_file_digest(f)) for document_id, f in zip(ids, uploaded_files)]
+
+    if not items:
+        raise ValueError("No documents to verify.")
+    if len(items) > settings.BATCH_VERIFICATION_MAX_ITEMS:
+        raise ValueError(f"Too many documents. At most {settings.BATCH_VERIFICATION_MAX_ITEMS} can be verified per request.")
+    return items
+
+
+def _verify_item(document, digest, full):
+    try:
+        digest_bytes = bytes.fromhex(digest)
+    except ValueError:
+        return {"error": "Invalid SHA-256 digest."}
+    if len(digest_bytes) != 32:
+        return {"error": "Invalid SHA-256 digest."}
+
+    if verify_document_digest(document, digest_bytes, full=full):
+        return {"verified": True, "message": "Document is authentic and untampered!"}
+    return {"verified": False, "message": "Document signature verification failed."}
+
+
+def verify_batch(items, full=False):
+    """
+    Verify many (document_id, digest) pairs, yielding one NDJSON line per item as it completes.
+
+    All documents (and their signature batches) are fetched with a single query and
+    checked in parallel on a thread pool. With `full`, every item also gets the public-key
+    signature check, which Merkle-batched documents share per batch.
+    """
+    documents = Document.objects.filter(document_id__in={document_id for document_id, _ in items}).select_related(
+        "signature_batch"
+    ).only(
+        "document_id", "signed_hash", "merkle_root", "page_hashes", "signature", "signature_algorithm", "public_key",
+        "signature_batch", "batch_index", "batch_proof",
+        "signature_batch__root", "signature_batch__size", "signature_batch__signature",
+        "signature_batch__signature_algorithm", "signature_batch__public_key",
+    ).in_bulk(field_name="document_id")
+
+    futures = {}
+    for document_id, digest in items:
+        document = documents.get(document_id)
+        if document is None:
+            yield json.dumps({"id": document_id, "error": "Document not found."}) + "\n"
+            continue
+        futures[_executor.submit(_verify_item, document, digest, full)] = document_id
+
+    for future in as_completed(futures):
+        yield json.dumps({"id": futures[future], **future.result()}) + "\n"
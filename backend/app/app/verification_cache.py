@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LocMemBackend:
+    """
+    Per-process LRU, bounded by number of entries.
+    """
+
+    def __init__(self, options):
+        self.max_entries = options.get("MAX_ENTRIES", 10000)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class FileBackend:
+    """
+    One small JSON file per document, shared by every process on the host.
+    """
+
+    def __init__(self, options):
+        self.location = str(options["LOCATION"])
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as entry:
+                return json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        os.makedirs(self.location, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix=".tmp")
+        with os.fdopen(fd, "w") as entry:
+            json.dump(value, entry)
+        os.replace(tmp_path, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class DjangoCacheBackend:
+    """
+    Any configured Django cache (e.g. Redis or Memcached shared by all nodes).
+    """
+
+    def __init__(self, options):
+        self.cache = caches[options.get("CACHE_ALIAS", "default")]
+        self.timeout = options.get("TIMEOUT", 3600)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+
+BACKENDS = {
+    "locmem": LocMemBackend,
+    "file": FileBackend,
+    "django": DjangoCacheBackend,
+}
+
+
+class VerificationCache:
+    """
+    Cache of verify_document GET results.
+
+    Each entry is stored per document together with a fingerprint of the
+    signed file (mtime and size) and of the signature. When either changes
+    the fingerprint no longer matches and the entry is treated as a miss.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                options = settings.VERIFICATION_CACHE
+                self._backend = BACKENDS[options["BACKEND"]](options)
+            return self._backend
+
+    def _key(self, document_id):
+        return f"verification:{document_id}"
+
+    def fingerprint(self, document, path):
+        # Only file metadata is read, never its content
+        stat = os.stat(path)
+        signature_digest = hashlib.sha256(bytes(document.signature) + bytes(document.batch_proof or b"")).hexdigest()
+        return f"{stat.st_mtime_ns}:{stat.st_size}:{document.signed_hash or ''}:{signature_digest}"
+
+    def get(self, document_id, fingerprint):
+        entry = self.backend.get(self._key(document_id))
+        if entry and entry.get("fingerprint") == fingerprint:
+            return entry["verified"]
+        return None
+
+    def set(self, document_id, fingerprint, verified):
+        self.backend.set(self._key(document_id), {"fingerprint": fingerprint, "verified": verified})
+
+    def invalidate(self, document_id):
+        self.backend.delete(self._key(document_id))
+
+
+verification_cache = VerificationCache()
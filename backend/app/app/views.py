@@ -1,29 +1,40 @@
 from django.contrib.auth.models import User
 import json
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse, HttpResponse, FileResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from .models import Document
-from .digital_signature import verify_signature, sign_document
-from .qr_code import embed_qr_code_and_link
+from .models import Document, SigningJob
+from .verification import verify_document_digest, find_document_by_digest, collect_verification_items, verify_batch
+from .verification import stored_copy_etag, verify_stored_copy, ocr_similarity, locate_tampering, verify_pages
+from .verification_cache import verification_cache
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from .uploads import uploaded_file_digest
+from .signing import store_upload, sign_stored_document
+from .jobs import enqueue_signing_job
+from .batch import collect_batch_items, sign_batch
+from .key_pool import key_pool
+from .instrumentation import registry, span
+from .signature_batches import batch_signer
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.serialization import load_pem_public_key
 from django.contrib.auth import authenticate, login
-import uuid
 from django.urls import reverse
-import hashlib
 from django.shortcuts import render
 import pytesseract
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-from .utils import extract_text_from_pdf, extract_text_from_image
+from .utils import extract_text_from_image
+from .pdf_ocr import extract_pdf_text_or_ocr, pdf_extraction_config, uploaded_pdf_path
+from .extraction_cache import extraction_cache
+from .image_preprocessing import parse_stages
 from rest_framework.pagination import PageNumberPagination
+from .pagination import KeysetPagination, filter_documents
+from .search import search_documents
+from .downloads import serve_document, zip_export_response
 from django.contrib.auth.decorators import login_required
 
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -112,22 +123,40 @@ def validate_uploaded_file(uploaded_file, allowed_extensions=None):
 
 
 # Perform OCR verification of document
-def perform_ocr_verification(uploaded_file, stored_text_content):
+def perform_ocr_verification(uploaded_file, document, bypass_cache=False, stages=None, timings=None):
     """
-    Perform OCR verification for an uploaded file against stored content.
+    Perform OCR verification for an uploaded file against the stored document.
+
+    Returns the similarity score of the extracted text (0.0 to 1.0). Images are
+    preprocessed with `stages` (OCR_PREPROCESSING_STAGES by default) and the
+    duration of each stage is added to `timings`.
     """
+    stages = settings.OCR_PREPROCESSING_STAGES if stages is None else stages
     validate_uploaded_file(uploaded_file, allowed_extensions=['pdf', 'png', 'jpg', 'jpeg'])
-    
-    # Depending on file type, use OCR to extract text
+
+    def extract_pdf():
+        # Scanned PDFs without a text layer are rasterised and OCRed page by page
+        with uploaded_pdf_path(uploaded_file) as pdf_path:
+            return extract_pdf_text_or_ocr(pdf_path)
+
+    # Depending on file type, use OCR to extract text; retries of the same upload reuse the cached text
+    upload_digest = uploaded_file_digest(uploaded_file)
     if uploaded_file.name.lower().endswith(('png', 'jpg', 'jpeg')):
-        extracted_text = extract_text_from_image(uploaded_file)
+        extracted_text = extraction_cache.get_or_extract(
+            upload_digest,
+            {"engine": "tesseract", "lang": "eng", "preprocess": list(stages), "dpi": settings.OCR_TARGET_DPI},
+            lambda: extract_text_from_image(uploaded_file, stages, settings.OCR_TARGET_DPI, timings),
+            bypass=bypass_cache,
+        )
     elif uploaded_file.name.lower().endswith('pdf'):
-        extracted_text = extract_text_from_pdf(uploaded_file)
+        extracted_text = extraction_cache.get_or_extract(
+            upload_digest, pdf_extraction_config(), extract_pdf, bypass=bypass_cache,
+        )
     else:
         raise ValueError("Unsupported file format for OCR verification.")
     
-    # Compare the extracted text with stored content for verification
-    return extracted_text.strip() == stored_text_content.strip()
+    # Compare the extracted text with the stored fingerprint, ignoring the QR stamp and OCR noise
+    return ocr_similarity(document, extracted_text)
 
 
 # Document verification view
@@ -137,28 +166,71 @@ def verify_document(request):
             document_id = request.POST.get("id")
             uploaded_file = request.FILES.get("document")
             use_ocr = request.POST.get("use_ocr", "false").lower() == "true"
+            full_check = request.POST.get("full", "false").lower() == "true"
+            bypass_cache = request.POST.get("no_cache", "false").lower() == "true"
+            stages = parse_stages(request.POST["preprocess"]) if "preprocess" in request.POST else None
+
+            # Without an ID, identify the document from the uploaded bytes alone
+            if not document_id and uploaded_file and not use_ocr:
+                validate_uploaded_file(uploaded_file)
+                document = find_document_by_digest(bytes.fromhex(uploaded_file_digest(uploaded_file)))
+                if document is None:
+                    return JsonResponse({"verified": False, "message": "No signed document matches the uploaded file."})
+                if full_check and not verify_document_digest(document, bytes.fromhex(document.signed_hash), full=True):
+                    return JsonResponse({"verified": False, "message": "Document signature verification failed."})
+                return JsonResponse({"verified": True, "document_id": document.document_id, "message": "Document is authentic and untampered!"})
 
             if not document_id or not uploaded_file:
                 return JsonResponse({"error": "Document ID and file are required."}, status=400)
 
-            document = get_object_or_404(Document, document_id=document_id)
+            # The stored text is only loaded if the document has no fingerprint yet
+            with span("document_lookup"):
+                document = get_object_or_404(Document.objects.metadata(), document_id=document_id)
             validate_uploaded_file(uploaded_file)
 
             if use_ocr:
-                extracted_text = perform_ocr_verification(uploaded_file, document.text_content)
-                if extracted_text:
-                    return JsonResponse({"verified": True, "message": "OCR Verification: Document content matches."})
+                # Preprocessing timings are only reported when OCR actually ran (not on a cache hit)
+                timings = {}
+                similarity = round(perform_ocr_verification(uploaded_file, document, bypass_cache, stages, timings), 3)
+                if similarity >= settings.OCR_SIMILARITY_THRESHOLD:
+                    result = {"verified": True, "similarity": similarity, "message": "OCR Verification: Document content matches."}
                 else:
-                    return JsonResponse({"verified": False, "message": "OCR Verification: Document content does not match."})
+                    result = {"verified": False, "similarity": similarity, "message": "OCR Verification: Document content does not match."}
+                if timings:
+                    result["preprocessing_ms"] = timings
+                return JsonResponse(result)
+            elif request.POST.get("pages"):
+                # Verify only a page or page range ("3" or "3-5") against the signed page hashes
+                first_page, _, last_page = request.POST["pages"].partition("-")
+                try:
+                    first_page, last_page = int(first_page), int(last_page or first_page)
+                except ValueError:
+                    return JsonResponse({"error": "pages must be a page number or a range like 3-5."}, status=400)
+                with uploaded_pdf_path(uploaded_file) as pdf_path:
+                    pages = verify_pages(document, pdf_path, first_page, last_page)
+                verified = all(pages.values())
+                return JsonResponse({
+                    "verified": verified,
+                    "pages": {str(number): ok for number, ok in pages.items()},
+                    "message": "Pages are authentic and untampered!" if verified else "Page verification failed.",
+                })
             else:
-                uploaded_content = uploaded_file.read()
-                public_key = load_pem_public_key(document.public_key, backend=default_backend())
-                is_verified = verify_signature(uploaded_content, document.signature, public_key)
+                # The upload handler already hashed the file while it was received;
+                # compare digests first and only run the signature check when needed or asked for
+                uploaded_digest = bytes.fromhex(uploaded_file_digest(uploaded_file))
+                is_verified = verify_document_digest(document, uploaded_digest, full=full_check)
 
                 if is_verified:
                     return JsonResponse({"verified": True, "message": "Document is authentic and untampered!"})
                 else:
-                    return JsonResponse({"verified": False, "message": "Document signature verification failed."})
+                    # Report which pages differ from the ones that were signed
+                    result = {"verified": False, "message": "Document signature verification failed."}
+                    if uploaded_file.name.lower().endswith(".pdf"):
+                        with uploaded_pdf_path(uploaded_file) as pdf_path:
+                            tampering = locate_tampering(document, pdf_path)
+                        if tampering is not None:
+                            result.update(tampering)
+                    return JsonResponse(result)
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
@@ -168,21 +240,27 @@ def verify_document(request):
             document_id = request.GET.get("id")
 
             # Retrieve document for verification
-            document = get_object_or_404(Document, document_id=document_id)
+            document = get_object_or_404(Document.objects.metadata(), document_id=document_id)
 
-            public_key = load_pem_public_key(document.public_key, backend=default_backend())
-            # Recompute content hash for verification
-            with open(document.pdf_file.path, "rb") as pdf_file:
-                current_content = pdf_file.read()
+            # Repeat scans of an unchanged document are answered from the ETag alone
+            fingerprint = verification_cache.fingerprint(document, document.pdf_file.path)
+            etag = stored_copy_etag(fingerprint)
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+            else:
+                # Recompute content hash for verification unless the result is cached
+                is_verified = verify_stored_copy(document, fingerprint)
+                verification_status = "Authentic and Untampered" if is_verified else "Document Verification Failed"
 
-            is_verified = verify_signature(current_content, document.signature, public_key)
-            verification_status = "Authentic and Untampered" if is_verified else "Document Verification Failed"
+                response = render(
+                    request,
+                    "verify_document.html",
+                    {"document_id": document.document_id, "status": verification_status},
+                )
 
-            return render(
-                request,
-                "verify_document.html",
-                {"document_id": document.document_id, "status": verification_status},
-            )
+            response["ETag"] = etag
+            patch_cache_control(response, public=True, max_age=settings.VERIFICATION_CACHE_MAX_AGE)
+            return response
 
         except Document.DoesNotExist:
             return render(request, "verify_document.html", {"error": "Document not found."})
@@ -192,6 +270,20 @@ def verify_document(request):
     return JsonResponse({"error": "Invalid request method."}, status=400)
 
 
+# Batch verification view
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def verify_documents_batch(request):
+    try:
+        items = collect_verification_items(request)
+    except ValueError as ve:
+        return JsonResponse({"error": str(ve)}, status=400)
+
+    # Stream one JSON line per document as soon as it has been checked
+    full_check = str(request.data.get("full", "false")).lower() == "true"
+    return StreamingHttpResponse(verify_batch(items, full=full_check), content_type="application/x-ndjson")
+
+
 # Document signing view
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -204,72 +296,19 @@ def create_signed_document(request):
             return JsonResponse({"error": "No file uploaded"}, status=400)
 
         try:
-            # Read the file content for hashing and signing
-            document_content = uploaded_file.read()
-            
-            if len(document_content) == 0:
+            if uploaded_file.size == 0:
                 return JsonResponse({"error": "Uploaded file is empty"}, status=400)
 
-            # Reset file pointer after reading for text extraction
-            uploaded_file.seek(0)
+            # Async mode: queue the upload for the signing workers and return the job ID at once
+            if str(request.data.get("async", "false")).lower() == "true":
+                job = enqueue_signing_job(uploaded_file, document_name, user=request.user)
+                return JsonResponse({"message": "Document accepted for signing.", "job_id": job.job_id, "status": job.status}, status=202)
 
-            # Extract text if it's a PDF (optional step for OCR verification)
-            extracted_text = ""
-            if uploaded_file.name.lower().endswith(".pdf"):
-                try:
-                    extracted_text = extract_text_from_pdf(uploaded_file)
-                except Exception as e:
-                    raise ValueError(f"Error extracting text from PDF: {str(e)}")
-
-            # Compute SHA-256 hash of the document content
-            document_hash = hashlib.sha256(document_content).hexdigest()
-
-            # Generate a private key for signing
-            private_key = rsa.generate_private_key(
-                public_exponent=65537,
-                key_size=2048
-            )
-
-            # Sign the document content
-            signature = sign_document(document_content, private_key)
-
-            # Generate a unique document ID
-            document_id = str(uuid.uuid4())
-
-            # Save the document in the database
-            document = Document.objects.create(
-                document_id=document_id,
-                document_name=document_name,
-                content=document_content,
-                hash=document_hash,  # Save the hash
-                signature=signature,
-                public_key=private_key.public_key().public_bytes(
-                    encoding=serialization.Encoding.PEM,
-                    format=serialization.PublicFormat.SubjectPublicKeyInfo
-                ),
-                pdf_file=uploaded_file,
-                text_content=extracted_text  # Save the extracted text for later OCR verification
-            )
-
-            # Generate a verification URL with a QR code
-            verification_url = f"http://localhost:8000/verify?id={document.document_id}"
-            document_path = document.pdf_file.path
-
-            # Embed QR code and verification link in the document PDF
-            embed_qr_code_and_link(document_path, verification_url, document_path)
-
-            # After embedding the QR code, sign the document again, ensuring it's signed and tamper-proof
-            # Re-read the document to apply the signature with QR embedded
-            with open(document_path, 'rb') as signed_file:
-                signed_document_content = signed_file.read()
-                
-            signature_after_qr = sign_document(signed_document_content, private_key)
-            
-            # Update the document with the new signature after QR embedding
-            document.signature = signature_after_qr
-            document.save()  # Save the updated signature
-
-            return JsonResponse({"message": "Document signed, QR code embedded, and saved successfully!", "document_id": document_id})
+            with span("store_upload"):
+                document_hash = store_upload(uploaded_file)
+            document = sign_stored_document(document_hash, uploaded_file.name, document_name, tenant=request.user.pk, owner_id=request.user.pk)
+
+            return JsonResponse({"message": "Document signed, QR code embedded, and saved successfully!", "document_id": document.document_id})
 
         except ValueError as ve:
             return JsonResponse({"error": f"Error processing the PDF: {str(ve)}"}, status=400)
@@ -280,18 +319,113 @@ def create_signed_document(request):
         return JsonResponse({"error": "Invalid request method"}, status=400)
 
 
+# Batch signing view
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_signed_documents_batch(request):
+    try:
+        items = collect_batch_items(request)
+    except ValueError as ve:
+        return JsonResponse({"error": str(ve)}, status=400)
+
+    # Stream one JSON line per document as soon as it has been signed and saved
+    return StreamingHttpResponse(sign_batch(items, tenant=request.user.pk, owner_id=request.user.pk), content_type="application/x-ndjson")
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "document_name": job.document_name,
+        "document_id": job.document.document_id if job.document_id else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# Signing job status view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def signing_job_status(request, job_id):
+    job = get_object_or_404(SigningJob.objects.select_related("document"), job_id=job_id, user=request.user)
+    return JsonResponse(serialize_job(job))
+
+
+# Signing job result view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def signing_job_result(request, job_id):
+    job = get_object_or_404(SigningJob.objects.select_related("document"), job_id=job_id, user=request.user)
+
+    if job.status == SigningJob.SUCCEEDED:
+        return JsonResponse({"message": "Document signed, QR code embedded, and saved successfully!", "document_id": job.document.document_id})
+    if job.status == SigningJob.FAILED:
+        return JsonResponse({"error": f"Error processing the PDF: {job.error}"}, status=400)
+
+    # Still queued or running
+    return JsonResponse({"job_id": job.job_id, "status": job.status}, status=202)
+
+
 # Document download view
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_document(request, document_id):
     # Retrieve the document by its ID
-    document = get_object_or_404(Document, id=document_id)
+    document = get_object_or_404(Document.objects.metadata(), id=document_id)
     
     # Get the document name from the document instance
     document_name = document.document_name
     
-    # Return the document as an attachment with the document name as the filename
-    return FileResponse(document.pdf_file, as_attachment=True, filename=f"{document_name}.pdf")
+    # Return the document as an attachment with the document name as the filename,
+    # answering conditional and Range requests (or offloading to the proxy)
+    return serve_document(request, document, f"{document_name}.pdf")
+
+
+# Zip export of several signed copies
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_documents(request):
+    ids = [value for param in request.query_params.getlist("ids") for value in param.split(",") if value]
+    if not ids or not all(value.isdigit() for value in ids):
+        return JsonResponse({"error": "A list of document ids is required."}, status=400)
+    if len(ids) > settings.DOWNLOAD_EXPORT_MAX_DOCUMENTS:
+        return JsonResponse({"error": f"At most {settings.DOWNLOAD_EXPORT_MAX_DOCUMENTS} documents can be exported at once."}, status=400)
+
+    documents = Document.objects.only("id", "document_id", "document_name", "pdf_file", "created_at").filter(id__in=ids).order_by("id")
+    # The archive is written while it is sent, one file at a time
+    return zip_export_response(documents.iterator())
+
+
+# Key pool metrics
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def key_pool_status(request):
+    return JsonResponse(key_pool.stats())
+
+
+# Extraction cache metrics
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def extraction_cache_status(request):
+    return JsonResponse(extraction_cache.stats())
+
+
+# Prometheus scrape target for the pipeline histograms; only served while METRICS_ENABLED,
+# and meant to be reachable from the internal network only
+@require_http_methods(["GET"])
+def metrics(request):
+    if not settings.METRICS_ENABLED:
+        return JsonResponse({"error": "Metrics are disabled."}, status=404)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Merkle-batched signing metrics
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def signature_batch_status(request):
+    return JsonResponse({"enabled": settings.SIGNATURE_BATCHING, **batch_signer.stats()})
 
 
 class DocumentPagination(PageNumberPagination):
@@ -302,19 +436,67 @@ class DocumentPagination(PageNumberPagination):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_documents(request):
-    documents = Document.objects.all()
-    paginator = DocumentPagination()
-    result_page = paginator.paginate_queryset(documents, request)
-    
-    document_list = [
+    # Only the listed columns are selected, never the text or signature blobs
+    try:
+        documents = filter_documents(Document.objects.values("id", "document_name", "created_at"), request)
+    except ValueError as ve:
+        return JsonResponse({"error": str(ve)}, status=400)
+
+    # ?page= keeps the numbered pages (with a total count) the frontend uses;
+    # everything else is paged by cursor in constant time per page
+    if "page" in request.query_params:
+        paginator = DocumentPagination()
+        result_page = paginator.paginate_queryset(documents.order_by("-created_at", "-id"), request)
+    else:
+        paginator = KeysetPagination()
+        try:
+            result_page = paginator.paginate_queryset(documents, request)
+        except ValueError as ve:
+            return JsonResponse({"error": str(ve)}, status=400)
+
+    return paginator.get_paginated_response(document_list(result_page, request))
+
+
+def document_list(rows, request):
+    """
+    The list_documents entries for rows of id, document_name and created_at.
+    """
+    return [
+        {
+            "document_id": doc["id"],
+            "document_name": doc["document_name"],
+            "download_url": request.build_absolute_uri(reverse('download_document', args=[doc["id"]])),
+        }
+        for doc in rows
+    ]
+
+
+# Full-text search over document names and text
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_documents_view(request):
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "A search query (q) is required."}, status=400)
+
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+        offset = max(0, int(request.query_params.get("offset", 0)))
+    except ValueError:
+        return JsonResponse({"error": "limit and offset must be integers."}, status=400)
+    owner_id = request.user.pk if request.query_params.get("owner") == "me" else None
+
+    results = [
         {
-            "document_id": doc.id,
-            "document_name": doc.document_name,
-            "download_url": request.build_absolute_uri(reverse('download_document', args=[doc.id])),
+            "document_id": match["id"],
+            "document_name": match["document_name"],
+            "score": match["score"],
+            "snippet": match["snippet"],
+            "download_url": request.build_absolute_uri(reverse('download_document', args=[match["id"]])),
         }
-        for doc in result_page
+        for match in search_documents(query, limit, offset, owner_id)
     ]
-    return paginator.get_paginated_response(document_list)
+    return JsonResponse({"query": query, "results": results})
 
 
 @api_view(['POST'])